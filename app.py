@@ -1,12 +1,15 @@
-from flask import Flask
+from flask import Flask, g, request
 from models import db
+from models.database import check_slot_unique_index
 from routes import main_bp, courses_bp, registration_bp, upload_bp, auth_bp, sitemap_bp, generate_bp
 from routes.auth import init_oauth
+from utils.json_provider import OrjsonProvider
 from flask_compress import Compress
 from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 # Vercel sits behind a proxy, so we need to trust the headers (X-Forwarded-Proto, etc.)
 # x_proto=1 (HTTPS), x_host=1, x_port=1, x_prefix=1
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
@@ -32,28 +35,50 @@ app.register_blueprint(sitemap_bp)
 # Create tables
 with app.app_context():
     db.create_all()
+    check_slot_unique_index(app)
 
-from flask import request
+# Cache-busting for static assets: url_for('static', ...) gets ?v=<mtime>,
+# so files can be cached for a year (SEND_FILE_MAX_AGE_DEFAULT) and still
+# update on deploy. No-cache headers for per-user data are set per blueprint.
+_static_versions = {}
 
+@app.url_defaults
+def static_cache_buster(endpoint, values):
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    filename = values['filename']
+    if filename not in _static_versions:
+        try:
+            _static_versions[filename] = int(os.stat(os.path.join(app.static_folder, filename)).st_mtime)
+        except OSError:
+            _static_versions[filename] = None
+    if _static_versions[filename]:
+        values['v'] = _static_versions[filename]
+
+# Debug-only query counter (see models/database.py) to catch N+1 regressions
 @app.after_request
-def add_header(response):
-    """Add headers to prevent caching for API/HTML, but allow for Static/Sitemaps."""
-    # Allow caching for static files, sitemap, and robots.txt
-    if 'static' in request.url or 'sitemap' in request.url or 'robots.txt' in request.url:
-        return response
-        
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+def report_sql_count(response):
+    if app.debug:
+        sql_count = g.get('sql_count', 0)
+        response.headers['X-SQL-Count'] = str(sql_count)
+        app.logger.debug(f"{request.method} {request.path}: {sql_count} SQL statements")
     return response
 
-# Background Cleanup Task - ONLY for Guest data (preserves logged-in user data)
+# Cleanup Task - ONLY for Guest data (preserves logged-in user data)
+# Scheduled hourly by Celery beat (see tasks.py) or by the Vercel cron below;
+# `python app.py` runs it from a local thread (see cleanup_orphaned_data).
+import atexit
 import threading
-import time
 from datetime import datetime, timedelta, timezone
-from models import Course
+from models import Course, Slot, Registration
 
 import os
+import time
+
+# Delete in small batches so the write lock is released between chunks
+# (SQLite locks the whole DB for the duration of a write transaction).
+CLEANUP_BATCH_SIZE = 500
+CLEANUP_BATCH_PAUSE = 0.05  # seconds
 
 def _perform_cleanup_logic():
     """Core cleanup logic to delete old GUEST data only. Logged-in user data is preserved forever."""
@@ -62,37 +87,62 @@ def _perform_cleanup_logic():
             # Define cutoff time (7 days ago)
             cutoff = datetime.now(timezone.utc) - timedelta(days=7)
             
-            deleted_count = 0
+            # Cheap EXISTS probe first: the usual run has nothing to clean
+            has_expired = db.session.query(
+                db.session.query(Course.id).filter(
+                    Course.guest_id.isnot(None), 
+                    Course.created_at < cutoff
+                ).exists()
+            ).scalar()
+            if not has_expired:
+                return 0
             
-            # ONLY delete old Guest courses (courses with guest_id set)
-            # Logged-in user data (where user_id is set) is preserved forever
-            old_guest_courses = Course.query.filter(
-                Course.guest_id.isnot(None), 
-                Course.created_at < cutoff
-            ).all()
+            deleted_count = 0
             
-            if old_guest_courses:
-                print(f"[{datetime.now()}] Cleanup: Deleting {len(old_guest_courses)} old guest courses...")
-                for course in old_guest_courses:
-                    db.session.delete(course)
-                    deleted_count += 1
+            while True:
+                # ONLY delete old Guest courses (courses with guest_id set)
+                # Logged-in user data (where user_id is set) is preserved forever
+                # Oldest first; PKs are selected up front because DELETE ... LIMIT
+                # is not available on stock SQLite builds.
+                batch_ids = [row[0] for row in db.session.query(Course.id).filter(
+                    Course.guest_id.isnot(None), 
+                    Course.created_at < cutoff
+                ).order_by(Course.created_at).limit(CLEANUP_BATCH_SIZE)]
+                
+                if not batch_ids:
+                    break
+                
+                # Bulk DELETE statements (Manual Cascade, same as bulk course delete):
+                # children -> parents, without loading any ORM instances.
+                batch_slot_ids = db.session.query(Slot.id).filter(Slot.course_id.in_(batch_ids))
+                Registration.query.filter(Registration.slot_id.in_(batch_slot_ids)).delete(synchronize_session=False)
+                Slot.query.filter(Slot.course_id.in_(batch_ids)).delete(synchronize_session=False)
+                deleted_count += Course.query.filter(Course.id.in_(batch_ids)).delete(synchronize_session=False)
+                
+                # Commit per batch to release the lock, then let readers in
+                db.session.commit()
+                
+                if len(batch_ids) < CLEANUP_BATCH_SIZE:
+                    break
+                time.sleep(CLEANUP_BATCH_PAUSE)
             
             if deleted_count > 0:
-                db.session.commit()
                 print(f"[{datetime.now()}] Cleanup complete. Guest items deleted: {deleted_count}")
-                return deleted_count
             
-            return 0
+            return deleted_count
     except Exception as e:
         print(f"Cleanup error: {e}")
         return -1
 
-def cleanup_orphaned_data():
-    """Background thread loop for local development."""
+_cleanup_stop = threading.Event()
+
+def cleanup_orphaned_data(interval=3600):
+    """Background thread loop for local development (no Celery / cron)."""
+    # Event.wait instead of sleep: returns immediately once stop is set
     while True:
-        _perform_cleanup_logic()
-        # Run every hour (3600 seconds)
-        time.sleep(3600)
+        _perform_cleanup_logic()  # holds an app context only while it runs
+        if _cleanup_stop.wait(interval):
+            return
 
 @app.route('/api/cron/cleanup')
 def trigger_cleanup():
@@ -100,10 +150,11 @@ def trigger_cleanup():
     count = _perform_cleanup_logic()
     return {'status': 'success', 'deleted_count': count}
 
-# Start cleanup thread ONLY if not on Vercel
-if not os.environ.get('VERCEL'):
-    cleanup_thread = threading.Thread(target=cleanup_orphaned_data, daemon=True)
-    cleanup_thread.start()
-
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # Start cleanup thread in the serving process only (not the reloader parent)
+    if not app.config['DEBUG'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        cleanup_thread = threading.Thread(target=cleanup_orphaned_data, daemon=True)
+        cleanup_thread.start()
+        atexit.register(_cleanup_stop.set)
+    
+    app.run(debug=app.config['DEBUG'], port=5000)
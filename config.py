@@ -1,11 +1,13 @@
 import os
 import dotenv
+from sqlalchemy.pool import StaticPool
 dotenv.load_dotenv()
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Flask configuration
 SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-please-change-in-production'
-DEBUG = True
+# Off unless explicitly enabled (FLASK_DEBUG=1), so production never runs the debugger
+DEBUG = os.environ.get('FLASK_DEBUG') == '1'
 
 # Database configuration
 # Database configuration
@@ -29,12 +31,51 @@ else:
 
 print(f"DEBUG: Using Database URI: {SQLALCHEMY_DATABASE_URI}")
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-SQLALCHEMY_ENGINE_OPTIONS = {
-    "pool_pre_ping": True,
-    "pool_recycle": 300,
-}
+if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    # Local SQLite file: SQLAlchemy already pools it (QueuePool, check_same_thread
+    # off) and WAL is enabled on connect (models/database.py), so readers don't
+    # block the writer. Nothing goes stale, so no pinging/recycling.
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+elif os.environ.get('VERCEL'):
+    # Serverless Postgres: instances are frozen between invocations and the
+    # server may drop idle connections meanwhile, so keep the checkout ping.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_pre_ping": True,
+        "pool_recycle": 300,
+    }
+else:
+    # Long-running server (gunicorn gthread): size the pool per worker for the
+    # concurrent threads and recycle connections before the server's idle
+    # timeout instead of pinging on every checkout.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get('DB_POOL_SIZE', 10)),
+        "max_overflow": int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        "pool_recycle": 1800,
+        "pool_pre_ping": False,
+    }
+if SQLALCHEMY_DATABASE_URI.startswith('sqlite') and os.environ.get('VERCEL'):
+    # Serverless /tmp SQLite: keep ONE connection alive for the lifetime of the
+    # warm instance instead of reopening the file on every invocation.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "poolclass": StaticPool,
+        "connect_args": {"check_same_thread": False},
+        "pool_pre_ping": True,
+    }
+if SQLALCHEMY_DATABASE_URI.split('://', 1)[0] in ('postgresql', 'postgresql+psycopg2', 'cockroachdb', 'cockroachdb+psycopg2'):
+    # psycopg2: bulk INSERTs go out as multi-row VALUES pages (insertmanyvalues),
+    # executemany UPDATE/DELETE through psycopg2's execute_batch
+    SQLALCHEMY_ENGINE_OPTIONS.update({
+        "executemany_mode": "values_plus_batch",
+        "insertmanyvalues_page_size": 1000,
+    })
+
+# Static files are cache-busted with ?v=<mtime> (see app.py), so cache them for a year
+SEND_FILE_MAX_AGE_DEFAULT = 31536000
 
 # Google OAuth Configuration
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', 'placeholder-client-id')
 GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET', 'placeholder-client-secret')
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+
+# Celery (scheduled background jobs, see tasks.py)
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
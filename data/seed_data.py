@@ -10,11 +10,10 @@ from models import db, Course, Faculty, Slot, Registration
 def seed_database():
     """Populate database with sample data from DIFFERENTIAL.html."""
     
-    # Clear existing data
-    Registration.query.delete()
-    Slot.query.delete()
-    Faculty.query.delete()
-    Course.query.delete()
+    # Clear existing data: one predicate-less DELETE per table, children first
+    # (SQLite turns a bare DELETE FROM into its truncate fast path)
+    for model in (Registration, Slot, Faculty, Course):
+        db.session.execute(model.__table__.delete())
     
     # Create Faculties
     faculties_data = [
@@ -40,12 +39,7 @@ def seed_database():
         {'name': 'VIKRAM THAKUR', 'department': 'SCOPE'},
     ]
     
-    faculties = {}
-    for f_data in faculties_data:
-        faculty = Faculty(**f_data)
-        db.session.add(faculty)
-        db.session.flush()
-        faculties[f_data['name']] = faculty
+    db.session.bulk_insert_mappings(Faculty, faculties_data)
     
     # Create Courses
     courses_data = [
@@ -114,12 +108,12 @@ def seed_database():
         },
     ]
     
-    courses = {}
-    for c_data in courses_data:
-        course = Course(**c_data)
-        db.session.add(course)
-        db.session.flush()
-        courses[c_data['code']] = course
+    db.session.bulk_insert_mappings(Course, courses_data)
+    db.session.flush()
+    
+    # Resolve FKs in a second pass (tables were just cleared, so names/codes are unique)
+    faculty_ids = dict(db.session.query(Faculty.name, Faculty.id).all())
+    course_ids = dict(db.session.query(Course.code, Course.id).all())
     
     # Create Slots (based on DIFFERENTIAL.html data)
     slots_data = [
@@ -177,21 +171,22 @@ def seed_database():
         {'slot_code': 'E22+F22', 'course': 'PLA1006', 'faculty': 'SUNITA GUPTA', 'venue': 'AB02-217', 'available': 50},
     ]
     
+    slot_mappings = []
     for s_data in slots_data:
-        course = courses.get(s_data['course'])
-        faculty = faculties.get(s_data['faculty'])
+        course_id = course_ids.get(s_data['course'])
+        faculty_id = faculty_ids.get(s_data['faculty'])
         
-        if course and faculty:
-            slot = Slot(
-                slot_code=s_data['slot_code'],
-                course_id=course.id,
-                faculty_id=faculty.id,
-                venue=s_data['venue'],
-                available_seats=s_data['available'],
-                total_seats=70
-            )
-            db.session.add(slot)
+        if course_id and faculty_id:
+            slot_mappings.append({
+                'slot_code': s_data['slot_code'],
+                'course_id': course_id,
+                'faculty_id': faculty_id,
+                'venue': s_data['venue'],
+                'available_seats': s_data['available'],
+                'total_seats': 70
+            })
     
+    db.session.bulk_insert_mappings(Slot, slot_mappings)
     db.session.commit()
     print("Database seeded successfully!")
 
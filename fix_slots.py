@@ -1,38 +1,46 @@
 
-import re
+import mmap
 import os
 
-path = r'd:\PAPERS\application\assign\ffcs\templates\components\timetable_grid.html'
+try:
+    import re2 as re  # linear-time DFA engine (pip install google-re2), if available
+except ImportError:
+    import re
 
-with open(path, 'r', encoding='utf-8') as f:
-    content = f.read()
+path = r'd:\PAPERS\application\assign\ffcs\templates\components\timetable_grid.html'
 
 # Pattern explanation:
 # 1. Matches start of if block + invalid whitespace + <div class="slot-content">
 # 2. Captures <span class="course-code"... part (which means slot-code is missing before it)
-# 3. Matches rest until {% else %}
+#    up to the next "{%" - written as (non-"{" | "{" not followed by "%") instead of a
+#    DOTALL .*? so the engine never backtracks across the rest of the file
+# 3. Matches {% else %}
 # 4. Captures the slot code from inside <div class="slot-empty">CODE</div> using regex [A-Z0-9+]+
 # 5. Matches end if
 pattern = re.compile(
-    r'(% if slot_info %}<div class="slot-content">)\s*(<span class="course-code".*?)(% else %}<div\s+class="slot-empty">([A-Z0-9\+]+)</div>{% endif %})',
-    re.DOTALL
+    rb'(% if slot_info %}<div class="slot-content">)\s*(<span class="course-code"(?:[^{]|\{[^%])*\{)(% else %}<div\s+class="slot-empty">([A-Z0-9\+]+)</div>{% endif %})'
 )
 
 count = 0
-def repl(m):
-    global count
-    count += 1
-    prefix = m.group(1)   # {% if slot_info %}<div class="slot-content">
-    body = m.group(2)     # <span class="course-code" ...
-    suffix = m.group(3)   # {% else %}...{% endif %}
-    slot_code = m.group(4) # A11, B12+B22, etc.
-    
-    # We construct the new string inserting the slot code span
-    return f'{prefix}<span class="slot-code">{slot_code}</span><br>{body}{suffix}'
-
-new_content = re.sub(pattern, repl, content)
-
-with open(path, 'w', encoding='utf-8') as f:
-    f.write(new_content)
+chunks = []
+
+# Scan the file through a read-only memory map instead of reading a copy into memory
+with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+    last = 0
+    for m in pattern.finditer(content):
+        count += 1
+        prefix = m.group(1)     # {% if slot_info %}<div class="slot-content">
+        body = m.group(2)       # <span class="course-code" ...
+        suffix = m.group(3)     # {% else %}...{% endif %}
+        slot_code = m.group(4)  # A11, B12+B22, etc.
+
+        # We construct the new string inserting the slot code span
+        chunks.append(content[last:m.start()])
+        chunks.append(prefix + b'<span class="slot-code">' + slot_code + b'</span><br>' + body + suffix)
+        last = m.end()
+    chunks.append(content[last:])
+
+with open(path, 'wb') as f:
+    f.writelines(chunks)
 
 print(f"Updated {count} cells.")
@@ -0,0 +1,16 @@
+"""Gunicorn settings (picked up automatically: `gunicorn wsgi:app`).
+
+Threaded workers: the OAuth callback blocks on Google's token endpoint,
+so each worker keeps serving other requests on its remaining threads
+while a login is waiting on the network.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 30
+keepalive = 5
@@ -0,0 +1,15 @@
+from app import app, db
+from models.database import create_added_indexes, migrate_slot_unique_index
+
+def migrate_database():
+    """One-off schema upgrades for databases created by an older create_all()."""
+    print("Migrating database...")
+    with app.app_context():
+        removed = migrate_slot_unique_index()
+        print(f"Slot unique index in place ({removed} duplicate slot rows merged).")
+        create_added_indexes()
+        print("Added indexes created (if missing).")
+        print("Done.")
+
+if __name__ == "__main__":
+    migrate_database()
@@ -1,4 +1,5 @@
 from datetime import datetime
+from functools import cached_property
 from .database import db
 
 
@@ -6,6 +7,14 @@ class Course(db.Model):
     """Course model representing a course in the curriculum."""
     
     __tablename__ = 'courses'
+    __table_args__ = (
+        # Partial index for the guest cleanup predicate (guest_id IS NOT NULL AND created_at < cutoff)
+        db.Index(
+            'ix_courses_guest_cleanup', 'guest_id', 'created_at',
+            sqlite_where=db.text('guest_id IS NOT NULL'),
+            postgresql_where=db.text('guest_id IS NOT NULL')
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(20), nullable=False, index=True)
@@ -24,12 +33,14 @@ class Course(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship to slots
-    slots = db.relationship('Slot', backref='course', lazy='dynamic', cascade="all, delete-orphan")
+    slots = db.relationship('Slot', back_populates='course', lazy='selectin', cascade="all, delete-orphan")
     
     def __repr__(self):
         return f'<Course {self.code}: {self.name}>'
     
-    def to_dict(self):
+    @cached_property
+    def as_dict(self):
+        """Serialized payload, built once per instance (instances are request-scoped)."""
         return {
             'id': str(self.id),
             'code': self.code,
@@ -41,5 +52,8 @@ class Course(db.Model):
             'c': self.c,
             'course_type': self.course_type,
             'category': self.category,
-            'ltpjc': f'{self.l} {self.t} {self.p} {self.j} {self.c}'
+            'ltpjc': ' '.join(map(str, (self.l, self.t, self.p, self.j, self.c)))
         }
+    
+    def to_dict(self):
+        return dict(self.as_dict)
@@ -1,7 +1,49 @@
+import json
+import sqlite3
+
+from flask import current_app, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, delete, event, func, inspect, select, text, update
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
+
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _connection_record):
+    """Tune SQLite connections (no-op for Postgres/CockroachDB).
+
+    WAL lets readers keep going while a writer (e.g. the guest cleanup) holds
+    the lock; NORMAL sync is safe under WAL and avoids an fsync per commit.
+    """
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    cur.close()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_queries(conn, cursor, statement, parameters, context, executemany):
+    """Count SQL statements per request in debug mode (reported by app.after_request)."""
+    if has_request_context() and current_app.debug:
+        g.sql_count = g.get('sql_count', 0) + 1
+
+def dialect_insert(model):
+    """INSERT construct with ON CONFLICT support (on_conflict_do_*) for the active backend.
+
+    Accepts a mapped class (ORM-enabled insert) or a Table (plain Core insert).
+    """
+    if db.engine.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # PostgreSQL and CockroachDB share the postgresql INSERT dialect
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
 def init_app(app):
     db.init_app(app)
     # Import models to register them with SQLAlchemy
@@ -10,3 +52,133 @@ def init_app(app):
     from .slot import Slot
     from .registration import Registration
     from .user import User
+
+# Indexes declared after their tables first shipped: create_all() skips
+# existing tables, so migrate_db.py adds them as (name, table, columns)
+ADDED_INDEXES = (
+    ('ix_slots_course_id', 'slots', ('course_id',)),
+    ('ix_slots_faculty_id', 'slots', ('faculty_id',)),
+    ('ix_registrations_slot_id', 'registrations', ('slot_id',)),
+    ('ix_registration_user_slot', 'registrations', ('user_id', 'slot_id')),
+    ('ix_registration_guest_slot', 'registrations', ('guest_id', 'slot_id')),
+)
+
+
+def create_added_indexes():
+    """CREATE INDEX IF NOT EXISTS for every ADDED_INDEXES entry (idempotent, no data changes)."""
+    for name, table, columns in ADDED_INDEXES:
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    db.session.commit()
+
+
+SLOT_UNIQUE_INDEX = 'uq_slot_course_code_venue'
+_SLOT_UNIQUE_COLUMNS = {'course_id', 'slot_code', 'venue'}
+
+
+def _has_slot_unique_index():
+    inspector = inspect(db.engine)
+    for uc in inspector.get_unique_constraints('slots'):
+        if uc.get('name') == SLOT_UNIQUE_INDEX or set(uc['column_names']) == _SLOT_UNIQUE_COLUMNS:
+            return True
+    for ix in inspector.get_indexes('slots'):
+        if ix.get('unique') and set(ix['column_names']) == _SLOT_UNIQUE_COLUMNS:
+            return True
+    return False
+
+
+def check_slot_unique_index(app):
+    """
+    Record in app.config['SLOT_UNIQUE_INDEX'] whether slots has its unique index.
+
+    Read-only (run at startup): with the index, imports and slot syncs use
+    INSERT ... ON CONFLICT; without it they look up existing slots first.
+    """
+    app.config['SLOT_UNIQUE_INDEX'] = _has_slot_unique_index()
+    if not app.config['SLOT_UNIQUE_INDEX']:
+        app.logger.warning("slots has no %s index - run `python migrate_db.py`", SLOT_UNIQUE_INDEX)
+
+
+def migrate_slot_unique_index():
+    """
+    Add uq_slot_course_code_venue to databases created before it existed.
+
+    create_all() never alters an existing table, so older databases may hold
+    duplicate (course_id, slot_code, venue) rows. Those are merged into the
+    lowest id first: registrations and saved timetables are re-pointed to the
+    kept slot, then the extra rows are deleted and the unique index created.
+    One transaction; run it once per database via migrate_db.py, not at startup.
+
+    Returns the number of duplicate slot rows removed.
+    """
+    if _has_slot_unique_index():
+        return 0
+    try:
+        removed = _merge_duplicate_slots()
+        db.session.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {SLOT_UNIQUE_INDEX} "
+            "ON slots (course_id, slot_code, venue)"
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return removed
+
+
+def _merge_duplicate_slots():
+    slots = db.metadata.tables['slots']
+    key = (slots.c.course_id, slots.c.slot_code, slots.c.venue)
+    duplicated = select(*key).group_by(*key).having(func.count() > 1).subquery()
+    rows = db.session.execute(
+        select(slots.c.id, *key)
+        .join(duplicated, and_(*(col == duplicated.c[col.name] for col in key)))
+        .order_by(slots.c.id)
+    ).all()
+    if not rows:
+        return 0
+
+    keep_for = {}
+    remap = {}
+    for slot_id, course_id, slot_code, venue in rows:
+        keeper = keep_for.setdefault((course_id, slot_code, venue), slot_id)
+        if keeper != slot_id:
+            remap[slot_id] = keeper
+
+    registrations = db.metadata.tables['registrations']
+    for old_id, new_id in remap.items():
+        db.session.execute(
+            update(registrations).where(registrations.c.slot_id == old_id).values(slot_id=new_id)
+        )
+    # Re-pointing can leave an owner registered twice for a kept slot
+    seen = set()
+    extra = []
+    for reg_id, slot_id, user_id, guest_id in db.session.execute(
+        select(registrations.c.id, registrations.c.slot_id, registrations.c.user_id, registrations.c.guest_id)
+        .where(registrations.c.slot_id.in_(set(remap.values())))
+        .order_by(registrations.c.id)
+    ):
+        owner_key = (slot_id, user_id, guest_id)
+        if owner_key in seen:
+            extra.append(reg_id)
+        seen.add(owner_key)
+    if extra:
+        db.session.execute(delete(registrations).where(registrations.c.id.in_(extra)))
+
+    saved_timetables = db.metadata.tables['saved_timetables']
+    for saved_id, slot_ids_json in db.session.execute(
+        select(saved_timetables.c.id, saved_timetables.c.slot_ids_json)
+    ).all():
+        try:
+            slot_ids = json.loads(slot_ids_json)
+        except (TypeError, ValueError):
+            continue
+        if not any(sid in remap for sid in slot_ids):
+            continue
+        updated = list(dict.fromkeys(remap.get(sid, sid) for sid in slot_ids))
+        db.session.execute(
+            update(saved_timetables).where(saved_timetables.c.id == saved_id)
+            .values(slot_ids_json=json.dumps(updated))
+        )
+
+    db.session.execute(delete(slots).where(slots.c.id.in_(list(remap))))
+    return len(remap)
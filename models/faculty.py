@@ -1,3 +1,4 @@
+from functools import cached_property
 from .database import db
 
 
@@ -10,15 +11,21 @@ class Faculty(db.Model):
     name = db.Column(db.String(100), nullable=False)
     department = db.Column(db.String(50), nullable=True)
     
-    # Relationship to slots
-    slots = db.relationship('Slot', backref='faculty', lazy='dynamic')
+    # Relationship to slots (plain lazy load: faculties are shared across users,
+    # so eagerly pulling every slot of a faculty would cross ownership scopes)
+    slots = db.relationship('Slot', back_populates='faculty', lazy='select')
     
     def __repr__(self):
         return f'<Faculty {self.name}>'
     
-    def to_dict(self):
+    @cached_property
+    def as_dict(self):
+        """Cached to_dict payload."""
         return {
             'id': str(self.id),
             'name': self.name,
             'department': self.department
         }
+    
+    def to_dict(self):
+        return dict(self.as_dict)
@@ -6,15 +6,21 @@ class Registration(db.Model):
     """Registration model for user's registered course slots."""
     
     __tablename__ = 'registrations'
+    __table_args__ = (
+        # Owner lookups + "already registered for this course?" join on slot_id
+        db.Index('ix_registration_user_slot', 'user_id', 'slot_id'),
+        db.Index('ix_registration_guest_slot', 'guest_id', 'slot_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    slot_id = db.Column(db.Integer, db.ForeignKey('slots.id'), nullable=False)
+    slot_id = db.Column(db.Integer, db.ForeignKey('slots.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     guest_id = db.Column(db.String(100), nullable=True)
     registered_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relationship to slot
-    slot = db.relationship('Slot', backref=db.backref('registrations', lazy='dynamic', cascade='all, delete-orphan'))
+    # Relationships
+    slot = db.relationship('Slot', back_populates='registrations')
+    user = db.relationship('User', back_populates='registrations')
     
     def __repr__(self):
         return f'<Registration {self.id} - Slot {self.slot_id}>'
@@ -1,3 +1,5 @@
+from functools import cached_property, lru_cache
+from types import MappingProxyType
 from .database import db
 
 
@@ -5,20 +7,33 @@ class Slot(db.Model):
     """Slot model representing a course slot with timing, faculty, and venue."""
     
     __tablename__ = 'slots'
+    __table_args__ = (
+        # One row per (course, slot code, venue): imports rely on it for
+        # INSERT ... ON CONFLICT DO NOTHING. create_all won't add it to an existing
+        # table; migrate_db.py does (after merging duplicate rows).
+        db.UniqueConstraint('course_id', 'slot_code', 'venue', name='uq_slot_course_code_venue'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     slot_code = db.Column(db.String(50), nullable=False)  # e.g., "A11+A12", "B21+E14"
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
-    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.id'), nullable=False, index=True)
     venue = db.Column(db.String(50), nullable=False)  # e.g., "CR-011", "AB02-330"
     available_seats = db.Column(db.Integer, default=0)
     total_seats = db.Column(db.Integer, default=70)
     class_nbr = db.Column(db.String(50), nullable=True)  # Unique class identifier
     
+    # Relationships
+    course = db.relationship('Course', back_populates='slots')
+    faculty = db.relationship('Faculty', back_populates='slots')
+    registrations = db.relationship('Registration', back_populates='slot', cascade='all, delete-orphan')
+    
     def __repr__(self):
         return f'<Slot {self.slot_code} - {self.venue}>'
     
-    def to_dict(self):
+    @cached_property
+    def as_dict(self):
+        """Cached to_dict payload (same request-scoped caching as Course.as_dict)."""
         return {
             'id': str(self.id),
             'slot_code': self.slot_code,
@@ -33,14 +48,22 @@ class Slot(db.Model):
             'is_full': False  # No seat limit - always allow registration
         }
     
+    def to_dict(self):
+        return dict(self.as_dict)
+    
     def get_individual_slots(self):
         """Parse slot_code like 'A11+A12' into list ['A11', 'A12']."""
-        return self.slot_code.replace('/', '+').split('+')
+        return list(split_slot_code(self.slot_code))
+    
+    @property
+    def mask(self):
+        """Bitmask of the timetable cells this slot occupies (see SLOT_BITS)."""
+        return slot_code_mask(self.slot_code)
 
 
 # Slot timing reference - maps slot codes to day and period
-# Slot timing reference - matches timetable_grid.html
-SLOT_TIMINGS = {
+# Slot timing reference - matches timetable_grid.html (read-only)
+SLOT_TIMINGS = MappingProxyType({
     # MONDAY
     'A11': {'day': 'MON', 'period': 1, 'start': '08:30', 'end': '10:00'},
     'B11': {'day': 'MON', 'period': 2, 'start': '10:05', 'end': '11:35'},
@@ -94,9 +117,68 @@ SLOT_TIMINGS = {
     'D14': {'day': 'SAT', 'period': 5, 'start': '14:50', 'end': '16:20'},
     'D24': {'day': 'SAT', 'period': 6, 'start': '16:25', 'end': '17:55'},
     'E23': {'day': 'SAT', 'period': 7, 'start': '18:00', 'end': '19:30'},
-}
+})
+
+DAYS = ('MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT')
+PERIODS = tuple(range(1, 8))
+
+# Reverse indices, built once at import time
+SLOTS_BY_DAY = MappingProxyType({
+    day: frozenset(code for code, t in SLOT_TIMINGS.items() if t['day'] == day)
+    for day in DAYS
+})
+SLOTS_BY_PERIOD = MappingProxyType({
+    period: frozenset(code for code, t in SLOT_TIMINGS.items() if t['period'] == period)
+    for period in PERIODS
+})
+
+# One bit per slot code. Codes map 1:1 onto (day, period) cells, so two
+# slots clash in time exactly when their masks share a bit.
+SLOT_BITS = MappingProxyType({code: 1 << i for i, code in enumerate(SLOT_TIMINGS)})
+
+
+@lru_cache(maxsize=4096)
+def split_slot_code(slot_code):
+    """Split a combined slot code like 'A11+A12' (or 'A11/A12') into ('A11', 'A12')."""
+    return tuple(slot_code.replace('/', '+').split('+'))
+
+
+@lru_cache(maxsize=4096)
+def slot_code_cells(slot_code):
+    """(day, period) cells occupied by a combined slot code; unknown codes are skipped."""
+    cells = []
+    for code in split_slot_code(slot_code):
+        timing = SLOT_TIMINGS.get(code)
+        if timing:
+            cells.append((timing['day'], timing['period']))
+    return tuple(cells)
+
+
+def _codes_mask(codes):
+    mask = 0
+    for code in codes:
+        mask |= SLOT_BITS.get(code, 0)
+    return mask
+
+
+# Mutual exclusion: C1 slots (C11, C12, C13) cannot be taken with A2 slots (A21, A22, A23)
+C1_MASK = _codes_mask(('C11', 'C12', 'C13'))
+A2_MASK = _codes_mask(('A21', 'A22', 'A23'))
+MUTUAL_EXCLUSION_MASKS = ((C1_MASK, A2_MASK),)
+
+
+@lru_cache(maxsize=4096)
+def slot_code_mask(slot_code):
+    """Bitmask for a combined slot code like 'A11+A12' (unknown codes contribute nothing)."""
+    return _codes_mask(split_slot_code(slot_code))
 
 
+def masks_mutually_exclusive(mask_a, mask_b):
+    """True if the two masks fall on opposite sides of a mutual exclusion rule."""
+    for group_a, group_b in MUTUAL_EXCLUSION_MASKS:
+        if (mask_a & group_a and mask_b & group_b) or (mask_a & group_b and mask_b & group_a):
+            return True
+    return False
 
 
 def get_slot_timing(slot_code):
@@ -1,27 +1,71 @@
 from flask import Blueprint, url_for, session, redirect, flash, current_app
 from authlib.integrations.flask_client import OAuth
 from models import db, User
+from models.database import dialect_insert
+from utils.http_cache import add_nocache_headers
+import json
+import os
+import tempfile
+import time
 import uuid
 
 auth_bp = Blueprint('auth', __name__)
+auth_bp.after_request(add_nocache_headers)
 oauth = OAuth()
 
+# Google's OpenID discovery document, shared on disk between workers and warm
+# serverless invocations so only the first login per day has to fetch it
+DISCOVERY_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'google_oidc_discovery.json')
+DISCOVERY_CACHE_TTL = 24 * 60 * 60  # seconds
+
+def _load_cached_discovery():
+    """Return the cached discovery document if it is still fresh, else None."""
+    try:
+        if time.time() - os.path.getmtime(DISCOVERY_CACHE_PATH) < DISCOVERY_CACHE_TTL:
+            with open(DISCOVERY_CACHE_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _store_discovery(metadata):
+    """Persist the discovery document Authlib fetched (best effort)."""
+    metadata = {k: v for k, v in metadata.items() if not k.startswith('_')}
+    tmp_path = f'{DISCOVERY_CACHE_PATH}.{os.getpid()}'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, DISCOVERY_CACHE_PATH)
+    except OSError:
+        pass
+
 def init_oauth(app):
     oauth.init_app(app)
+    
+    # A fresh cached document is passed straight through as server metadata;
+    # otherwise Authlib fetches it lazily on the first login
+    cached = _load_cached_discovery()
+    metadata_kwargs = cached if cached else {'server_metadata_url': app.config['GOOGLE_DISCOVERY_URL']}
+    
     oauth.register(
         name='google',
         client_id=app.config['GOOGLE_CLIENT_ID'],
         client_secret=app.config['GOOGLE_CLIENT_SECRET'],
-        server_metadata_url=app.config['GOOGLE_DISCOVERY_URL'],
         client_kwargs={
             'scope': 'openid email profile'
-        }
+        },
+        **metadata_kwargs
     )
 
 @auth_bp.route('/login')
 def login():
     redirect_uri = url_for('auth.callback', _external=True)
-    return oauth.google.authorize_redirect(redirect_uri, hd='vitbhopal.ac.in')
+    response = oauth.google.authorize_redirect(redirect_uri, hd='vitbhopal.ac.in')
+    
+    # Authlib has loaded the discovery document by now - share it with other workers
+    if _load_cached_discovery() is None:
+        _store_discovery(oauth.google.server_metadata)
+    return response
 
 @auth_bp.route('/logout')
 def logout():
@@ -46,31 +90,31 @@ def callback():
             flash("Only vitbhopal.ac.in emails are allowed.", "error")
             return redirect(url_for('main.index'))
 
-        # Check if user exists
-        user = User.query.filter_by(google_id=user_info['sub']).first()
+        # Create the user or refresh their profile info in one round-trip
+        stmt = dialect_insert(User).values(
+            google_id=user_info['sub'],
+            email=email,
+            name=user_info.get('name', ''),
+            profile_pic=user_info.get('picture', '')
+        )
+        # Existing user: update profile info (keep stored values for fields Google didn't send)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.google_id],
+            set_={
+                'name': stmt.excluded.name if 'name' in user_info else User.name,
+                'profile_pic': stmt.excluded.profile_pic if 'picture' in user_info else User.profile_pic
+            }
+        ).returning(User.id, User.name)
         
-        if not user:
-            # Create new user
-            user = User(
-                google_id=user_info['sub'],
-                email=email,
-                name=user_info.get('name', ''),
-                profile_pic=user_info.get('picture', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-        else:
-            # Update profile info
-            user.name = user_info.get('name', user.name)
-            user.profile_pic = user_info.get('picture', user.profile_pic)
-            db.session.commit()
+        user_id, user_name = db.session.execute(stmt).one()
+        db.session.commit()
 
         # Set session
-        session['user_id'] = user.id
+        session['user_id'] = user_id
         # Clear guest_id to stop showing guest data
         session.pop('guest_id', None) 
         
-        flash(f"Logged in as {user.name}", "success")
+        flash(f"Logged in as {user_name}", "success")
         return redirect(url_for('main.index'))
     except Exception as e:
         current_app.logger.error(f"OAuth Error: {e}")
@@ -1,7 +1,14 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request, session, current_app
+from sqlalchemy import insert
 from models import db, Course, Slot, Faculty, Registration
+from models.database import dialect_insert
+from utils.http_cache import add_nocache_headers, make_etag
+from utils.course_search import course_search_index
 
 courses_bp = Blueprint('courses', __name__)
+courses_bp.after_request(add_nocache_headers)
+
+SEARCH_LIMIT = 20
 
 def get_scoped_courses():
     """Get base query for courses visible to current user."""
@@ -18,6 +25,25 @@ def get_scoped_courses():
         # but to be safe return Filter by False
         return Course.query.filter(db.false())
 
+def get_owner_key():
+    """Key of the current owner's entry in course_search_index."""
+    return (session.get('user_id'), session.get('guest_id'))
+
+def get_course_snapshot():
+    """In-process snapshot of the current owner's courses, reused while their course set is unchanged."""
+    base_query = get_scoped_courses()
+    owner_key = get_owner_key()
+    
+    # Changes with every create/delete, from any worker (max created_at covers reused
+    # ids); local writes also invalidate the entry
+    fingerprint = tuple(base_query.with_entities(
+        db.func.count(Course.id), db.func.max(Course.id), db.func.max(Course.created_at)
+    ).one())
+    return course_search_index.snapshot(
+        owner_key, fingerprint,
+        lambda: base_query.options(db.raiseload(Course.slots)).all()
+    )
+
 @courses_bp.route('/search')
 def search_courses():
     """Search courses by code or name."""
@@ -26,18 +52,9 @@ def search_courses():
     if not query_text:
         return jsonify({'courses': []})
     
-    # Scope query
-    base_query = get_scoped_courses()
-    
-    courses = base_query.filter(
-        db.or_(
-            Course.code.ilike(f'%{query_text}%'),
-            Course.name.ilike(f'%{query_text}%')
-        )
-    ).limit(20).all()
-    
+    snapshot = get_course_snapshot()
     return jsonify({
-        'courses': [course.to_dict() for course in courses]
+        'courses': snapshot.search(query_text, SEARCH_LIMIT)
     })
 
 
@@ -45,7 +62,7 @@ def search_courses():
 def get_course(course_id):
     """Get course details by ID."""
     base_query = get_scoped_courses()
-    course = base_query.filter_by(id=course_id).first_or_404()
+    course = base_query.filter_by(id=course_id).options(db.raiseload(Course.slots)).first_or_404()
     return jsonify(course.to_dict())
 
 
@@ -53,30 +70,46 @@ def get_course(course_id):
 def get_course_slots(course_id):
     """Get all available slots for a course."""
     base_query = get_scoped_courses()
-    course = base_query.filter_by(id=course_id).first_or_404()
+    course = base_query.filter_by(id=course_id).options(db.raiseload(Course.slots)).first_or_404()
     
-    # Slots don't have user_id explicit, but if we found the course,
-    # the slots linked to it are authorized.
-    # Eager load Faculty and Course to prevent N+1 queries during serialization
-    slots = Slot.query.filter_by(course_id=course_id).options(
-        db.joinedload(Slot.faculty),
-        db.joinedload(Slot.course)
-    ).all()
+    # Fingerprint of everything served (course payload + slot columns): lets the
+    # browser revalidate with If-None-Match and skip the joined slot query and
+    # serialization on a 304. Ids alone aren't enough - seats, venue and faculty
+    # change in place, and SQLite reuses the ids of replaced slots
+    slot_rows = db.session.query(
+        Slot.id, Slot.slot_code, Slot.venue, Slot.faculty_id,
+        Slot.available_seats, Slot.total_seats, Slot.class_nbr
+    ).filter(Slot.course_id == course.id).order_by(Slot.id).all()
+    etag = make_etag(course.to_dict(), *slot_rows)
     
-    return jsonify({
-        'course': course.to_dict(),
-        'slots': [slot.to_dict() for slot in slots]
-    })
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        # Slots don't have user_id explicit, but if we found the course,
+        # the slots linked to it are authorized.
+        # Eager load Faculty and Course to prevent N+1 queries during serialization
+        slots = Slot.query.filter_by(course_id=course_id).options(
+            db.joinedload(Slot.faculty),
+            db.joinedload(Slot.course)
+        ).all()
+        
+        response = jsonify({
+            'course': course.to_dict(),
+            'slots': [slot.to_dict() for slot in slots]
+        })
+    
+    response.set_etag(etag)
+    # Private (session-scoped data), but revalidated rather than refetched
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @courses_bp.route('/all')
 def get_all_courses():
     """Get all courses."""
-    base_query = get_scoped_courses()
-    courses = base_query.order_by(Course.code).all()
-    return jsonify({
-        'courses': [course.to_dict() for course in courses]
-    })
+    # Body is serialized once per snapshot (orjson) and served as-is afterwards
+    snapshot = get_course_snapshot()
+    return current_app.response_class(snapshot.all_json, mimetype='application/json')
 
 
 @courses_bp.route('/manual', methods=['POST'])
@@ -98,10 +131,18 @@ def add_course_manually():
         return jsonify({'error': 'No active session'}), 401
     
     try:
-        # Find or create course (Scoped)
+        # Look up existing rows first; everything new is only added to the
+        # session and INSERTed in one unit-of-work flush at commit (course ->
+        # faculty -> slot -> registration, FKs filled in via the relationships)
         base_query = get_scoped_courses()
         course = base_query.filter_by(code=data['course_code'].upper()).first()
         
+        # Find or create faculty (Faculty is shared? Or should be scoped?
+        # Faculty names are generic. Let's keep faculty shared for now to avoid DUPLICATE faculty table boom, 
+        # or just create if missing. Faculty has no sensitive data.)
+        faculty_name = data.get('faculty', 'N/A').strip() or 'N/A'
+        faculty = Faculty.query.filter_by(name=faculty_name).first()
+        
         if not course:
             course = Course(
                 code=data['course_code'].upper(),
@@ -116,34 +157,26 @@ def add_course_manually():
                 user_id=user_id,
                 guest_id=guest_id
             )
-            db.session.add(course)
-            db.session.flush()
         
-        # Find or create faculty (Faculty is shared? Or should be scoped?
-        # Faculty names are generic. Let's keep faculty shared for now to avoid DUPLICATE faculty table boom, 
-        # or just create if missing. Faculty has no sensitive data.)
-        faculty_name = data.get('faculty', 'N/A').strip() or 'N/A'
-        faculty = Faculty.query.filter_by(name=faculty_name).first()
         if not faculty:
             faculty = Faculty(name=faculty_name)
-            db.session.add(faculty)
-            db.session.flush()
         
-        # Create slot
+        # Create slot (or reuse the course's existing one - slot_code/venue are unique per course)
         venue = data.get('venue', 'N/A').strip().upper() or 'N/A'
-        slot = Slot(
-            slot_code=data['slot_code'].upper(),
-            course_id=course.id,
-            faculty_id=faculty.id,
-            venue=venue,
-            available_seats=70,
-            total_seats=70
-        )
-        db.session.add(slot)
-        db.session.flush()
+        slot_code = data['slot_code'].upper()
+        slot = next((s for s in course.slots if s.slot_code == slot_code and s.venue == venue), None)
+        if slot is None:
+            slot = Slot(
+                slot_code=slot_code,
+                course=course,
+                faculty=faculty,
+                venue=venue,
+                available_seats=70,
+                total_seats=70
+            )
         
         # Auto-register
-        registration = Registration(slot_id=slot.id)
+        registration = Registration(slot=slot)
         if user_id:
             registration.user_id = user_id
         else:
@@ -151,13 +184,22 @@ def add_course_manually():
             
         db.session.add(registration)
         
+        # The only flush (commit has nothing left to write afterwards). Serialize
+        # from the identity map before committing: commit expires every instance,
+        # and reading them afterwards would reload course, slot and faculty
+        db.session.flush()
+        course_payload = course.to_dict()
+        slot_payload = slot.to_dict()
+        message = f"Course {course.code} added and registered successfully!"
+        
         db.session.commit()
+        course_search_index.invalidate(get_owner_key())
         
         return jsonify({
             'success': True,
-            'message': f"Course {course.code} added and registered successfully!",
-            'course': course.to_dict(),
-            'slot': slot.to_dict()
+            'message': message,
+            'course': course_payload,
+            'slot': slot_payload
         }), 201
         
     except Exception as e:
@@ -174,6 +216,7 @@ def delete_course(course_id):
     try:
         db.session.delete(course)
         db.session.commit()
+        course_search_index.invalidate(get_owner_key())
         return jsonify({'success': True, 'message': f'Course {course.code} deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -221,6 +264,7 @@ def bulk_delete_courses():
         Course.query.filter(Course.id.in_(valid_ids)).delete(synchronize_session=False)
             
         db.session.commit()
+        course_search_index.invalidate(get_owner_key())
         return jsonify({'success': True, 'message': f'Successfully deleted {count} courses'})
         
     except Exception as e:
@@ -240,8 +284,7 @@ def sync_course_slots(course_id):
     
     try:
         # 2. Delete Existing Slots
-        existing_slots = Slot.query.filter_by(course_id=course.id).all()
-        slot_ids = [s.id for s in existing_slots]
+        slot_ids = [row.id for row in Slot.query.filter_by(course_id=course.id).with_entities(Slot.id)]
         
         if slot_ids:
              Registration.query.filter(Registration.slot_id.in_(slot_ids)).delete(synchronize_session=False)
@@ -251,34 +294,48 @@ def sync_course_slots(course_id):
         # Collect all unique faculty names first
         faculty_names = set(s_data.get('faculty', 'N/A').strip() or 'N/A' for s_data in slots_data)
         
-        # Fetch all existing faculties in one query
-        existing_faculties = Faculty.query.filter(Faculty.name.in_(faculty_names)).all()
-        faculty_map = {f.name: f for f in existing_faculties}
+        # Fetch all existing faculties in one query (name -> id)
+        faculty_map = dict(
+            db.session.query(Faculty.name, Faculty.id).filter(Faculty.name.in_(faculty_names)).all()
+        )
         
-        # Create missing faculties
-        missing_names = faculty_names - set(faculty_map.keys())
-        for name in missing_names:
-            new_faculty = Faculty(name=name)
-            db.session.add(new_faculty)
-            db.session.flush()
-            faculty_map[name] = new_faculty
+        # Create missing faculties in one INSERT ... RETURNING
+        missing_names = faculty_names - faculty_map.keys()
+        if missing_names:
+            inserted = db.session.execute(
+                insert(Faculty).returning(Faculty.id, Faculty.name),
+                [{'name': name} for name in missing_names]
+            )
+            faculty_map.update((name, fac_id) for fac_id, name in inserted)
         
-        # Now create slots using the map
+        # Now create slots using the map (single executemany).
+        # The course's old slots are gone, so only repeated slot_code/venue
+        # pairs in the payload can conflict; they collapse into one row.
+        slot_rows = {}
         for s_data in slots_data:
             fac_name = s_data.get('faculty', 'N/A').strip() or 'N/A'
-            faculty = faculty_map.get(fac_name)
+            slot_code = s_data.get('slot_code', 'N/A').upper()
+            venue = s_data.get('venue', 'N/A').upper()
             
-            new_slot = Slot(
-                slot_code=s_data.get('slot_code', 'N/A').upper(),
-                course_id=course.id,
-                faculty_id=faculty.id if faculty else None,
-                venue=s_data.get('venue', 'N/A').upper(),
-                available_seats=int(s_data.get('available_seats', 0)),
-                total_seats=int(s_data.get('available_seats', 0)) # Default total to avail
-            )
-            db.session.add(new_slot)
+            slot_rows.setdefault((slot_code, venue), {
+                'slot_code': slot_code,
+                'course_id': course.id,
+                'faculty_id': faculty_map.get(fac_name),
+                'venue': venue,
+                'available_seats': int(s_data.get('available_seats', 0)),
+                'total_seats': int(s_data.get('available_seats', 0)) # Default total to avail
+            })
+        if slot_rows:
+            if current_app.config.get('SLOT_UNIQUE_INDEX'):
+                stmt = dialect_insert(Slot.__table__).on_conflict_do_nothing(
+                    index_elements=['course_id', 'slot_code', 'venue']
+                )
+            else:
+                stmt = insert(Slot.__table__)
+            db.session.execute(stmt, list(slot_rows.values()))
             
         db.session.commit()
+        course_search_index.invalidate(get_owner_key())
         return jsonify({'success': True, 'message': f'Updated {len(slots_data)} slots for {course.code}'})
         
     except Exception as e:
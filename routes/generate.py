@@ -3,9 +3,11 @@
 from flask import Blueprint, request, jsonify, session, render_template
 from models import db, Course, Slot, Faculty, Registration, User, SavedTimetable
 from utils.timetable_generator import TimetableGenerator, GenerationPreferences
+from utils.http_cache import add_nocache_headers
 import uuid
 
 generate_bp = Blueprint('generate', __name__)
+generate_bp.after_request(add_nocache_headers)
 
 
 @generate_bp.route('/page')
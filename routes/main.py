@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, session
 from models import db, Registration, User, Slot, Course, Faculty
-from models.slot import SLOT_TIMINGS
+from models.slot import SLOT_TIMINGS, DAYS
+from utils.http_cache import add_nocache_headers
 import uuid
 
 main_bp = Blueprint('main', __name__)
+main_bp.after_request(add_nocache_headers)
 
 # Color palette for different courses (no gradients per user preference)
 COURSE_COLORS = [
@@ -28,10 +30,10 @@ def index():
     current_user = None
     registrations = []
     
-    # Eager load options
+    # Eager load options (one IN query per level; anything deeper raises instead of lazy loading)
     eager_options = (
-        db.joinedload(Registration.slot).joinedload(Slot.course),
-        db.joinedload(Registration.slot).joinedload(Slot.faculty)
+        db.selectinload(Registration.slot).selectinload(Slot.course).raiseload('*'),
+        db.selectinload(Registration.slot).selectinload(Slot.faculty).raiseload('*')
     )
 
     # Check for logged-in user
@@ -78,7 +80,7 @@ def index():
     course_count = len(registrations)
     
     # Define timetable structure
-    days = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+    days = DAYS
     periods = [
         {'num': 1, 'start': '08:30', 'end': '10:00'},
         {'num': 2, 'start': '10:05', 'end': '11:35'},
@@ -1,22 +1,35 @@
 from flask import Blueprint, jsonify, request, session
-from models import db, Registration, Slot, User
-from models.slot import get_slot_timing
+from models import db, Registration, Slot, Course, User
+from models.slot import slot_code_cells, masks_mutually_exclusive
+from utils.http_cache import add_nocache_headers
 
 registration_bp = Blueprint('registration', __name__)
+registration_bp.after_request(add_nocache_headers)
 
-def get_current_registrations_query():
-    """Helper to get registrations query based on current session."""
-    query = None
+def get_owner_filter():
+    """Helper to get the registration ownership criterion for the current session."""
     if 'user_id' in session:
-        query = Registration.query.filter_by(user_id=session['user_id'])
+        return Registration.user_id == session['user_id']
     elif 'guest_id' in session:
-        query = Registration.query.filter_by(guest_id=session['guest_id'])
-        
-    if query:
+        return Registration.guest_id == session['guest_id']
+    return None
+
+def get_current_registrations_query(for_clash_check=False):
+    """Helper to get registrations query based on current session."""
+    owner_filter = get_owner_filter()
+    if owner_filter is not None:
+        query = Registration.query.filter(owner_filter)
+        if for_clash_check:
+            # Clash checks read slot_code + course code/name only: a single
+            # JOINed round-trip beats extra IN queries for this small, hot set
+            return query.options(
+                db.joinedload(Registration.slot).joinedload(Slot.course).raiseload('*')
+            )
         # Eager load Slot, Course, and Faculty to prevent N+1 queries
+        # (one IN query per level; anything deeper raises instead of lazy loading)
         return query.options(
-            db.joinedload(Registration.slot).joinedload(Slot.course),
-            db.joinedload(Registration.slot).joinedload(Slot.faculty)
+            db.selectinload(Registration.slot).selectinload(Slot.course).raiseload('*'),
+            db.selectinload(Registration.slot).selectinload(Slot.faculty).raiseload('*')
         )
     return None
 
@@ -25,14 +38,12 @@ def get_registrations():
     """Get all registered courses."""
     query = get_current_registrations_query()
     registrations = query.all() if query else []
+    total_credits, _ = get_credit_totals()
     
     return jsonify({
         'registrations': [reg.to_dict() for reg in registrations],
         'count': len(registrations),
-        'total_credits': sum(
-            reg.slot.course.c for reg in registrations 
-            if reg.slot and reg.slot.course
-        )
+        'total_credits': total_credits
     })
 
 @registration_bp.route('/', methods=['POST'])
@@ -44,22 +55,25 @@ def register_course():
     if not slot_id:
         return jsonify({'error': 'slot_id is required'}), 400
         
-    query = get_current_registrations_query()
+    query = get_current_registrations_query(for_clash_check=True)
     if query is None:
         return jsonify({'error': 'No active session'}), 401
     
-    # Check if slot exists
-    slot = Slot.query.get(slot_id)
+    # Check if slot exists - and lock its row until commit, so concurrent
+    # requests registering the same slot are serialized (no-op on SQLite)
+    slot = db.session.get(Slot, slot_id, with_for_update=True)
     if not slot:
         return jsonify({'error': 'Slot not found'}), 404
     
+    # One query serves both checks: the owner's registrations (with slots)
+    registrations = query.all()
+    
     # Check if already registered for this course (scoped to user)
-    existing = query.join(Slot).filter(Slot.course_id == slot.course_id).first()
-    if existing:
+    if any(reg.slot and reg.slot.course_id == slot.course_id for reg in registrations):
         return jsonify({'error': 'Already registered for this course'}), 400
     
     # Check for clashes logic needs to be scoped too
-    clash_result = check_slot_clashes(slot)
+    clash_result = check_slot_clashes(slot, existing_registrations=registrations)
     if clash_result['has_clash']:
         return jsonify({
             'error': 'Slot clash detected',
@@ -84,16 +98,17 @@ def register_course():
 @registration_bp.route('/<int:reg_id>', methods=['DELETE'])
 def delete_registration(reg_id):
     """Delete a registration."""
-    # Ensure user owns this registration
-    query = get_current_registrations_query()
-    if query is None:
+    owner_filter = get_owner_filter()
+    if owner_filter is None:
         return jsonify({'error': 'No active session'}), 401
-        
-    registration = query.filter_by(id=reg_id).first()
-    if not registration:
+    
+    # Ownership check and delete in one statement: DELETE ... WHERE id AND owner
+    deleted = Registration.query.filter(
+        Registration.id == reg_id, owner_filter
+    ).delete(synchronize_session=False)
+    if not deleted:
         return jsonify({'error': 'Registration not found'}), 404
         
-    db.session.delete(registration)
     db.session.commit()
     
     return jsonify({'success': True})
@@ -102,8 +117,8 @@ def delete_registration(reg_id):
 @registration_bp.route('/bulk-delete', methods=['POST'])
 def bulk_delete_registrations():
     """Delete multiple registrations at once."""
-    query = get_current_registrations_query()
-    if query is None:
+    owner_filter = get_owner_filter()
+    if owner_filter is None:
         return jsonify({'error': 'No active session'}), 401
     
     data = request.get_json() or {}
@@ -118,16 +133,15 @@ def bulk_delete_registrations():
     except (ValueError, TypeError):
         return jsonify({'error': 'Invalid registration ID format'}), 400
     
-    # Find registrations owned by current user
-    registrations = query.filter(Registration.id.in_(reg_ids)).all()
+    # Delete the ones owned by the current user directly - no need to load
+    # registrations (and their eager-loaded slots/courses) just to delete them
+    deleted_count = Registration.query.filter(
+        Registration.id.in_(reg_ids), owner_filter
+    ).delete(synchronize_session=False)
     
-    if not registrations:
+    if not deleted_count:
         return jsonify({'error': 'No valid registrations found'}), 404
     
-    deleted_count = len(registrations)
-    for reg in registrations:
-        db.session.delete(reg)
-    
     db.session.commit()
     
     return jsonify({
@@ -184,6 +198,8 @@ def check_clash():
     data = request.get_json()
     slot_id = data.get('slot_id')
     exclude_reg_id = data.get('exclude_reg_id') # Optional exclusion
+    # ?first_only=1: caller only needs has_clash, stop at the first clash found
+    first_only = request.args.get('first_only', '').lower() in ('1', 'true')
     
     if not slot_id:
         return jsonify({'error': 'slot_id is required'}), 400
@@ -192,7 +208,7 @@ def check_clash():
     if not slot:
         return jsonify({'error': 'Slot not found'}), 404
     
-    result = check_slot_clashes(slot, exclude_reg_id=exclude_reg_id)
+    result = check_slot_clashes(slot, exclude_reg_id=exclude_reg_id, first_only=first_only)
     return jsonify(result)
 
 @registration_bp.route('/check-clash-batch', methods=['POST'])
@@ -212,17 +228,14 @@ def check_clash_batch():
     
     results = {}
     
-    # We could optimize check_slot_clashes to take a list of slots too, 
-    # but for now iterating here is still way better than N HTTP requests.
-    # The expensive part of check_slot_clashes is `get_current_registrations_query()`, 
-    # which we can cache/fetch once here.
-    
-    # Optimization: Fetch registrations ONCE
-    query = get_current_registrations_query()
+    # Optimization: Fetch registrations and build the occupancy map ONCE,
+    # then each candidate slot is a handful of dict lookups.
+    query = get_current_registrations_query(for_clash_check=True)
     registrations = query.all() if query else []
+    occupancy = build_occupancy(registrations, exclude_reg_id)
 
     for slot in slots:
-        results[slot.id] = check_slot_clashes(slot, exclude_reg_id=exclude_reg_id, existing_registrations=registrations)
+        results[slot.id] = check_slot_clashes(slot, occupancy=occupancy)
 
     return jsonify({'results': results})
 
@@ -230,98 +243,104 @@ def check_clash_batch():
 @registration_bp.route('/credits', methods=['GET'])
 def get_credits():
     """Get current credit summary."""
-    query = get_current_registrations_query()
-    registrations = query.all() if query else []
-    
-    total_credits = sum(
-        reg.slot.course.c for reg in registrations 
-        if reg.slot and reg.slot.course
-    )
+    total_credits, course_count = get_credit_totals()
     
     return jsonify({
         'total_credits': total_credits,
         'max_credits': 27,
         'min_credits': 16,
-        'course_count': len(registrations)
+        'course_count': course_count
     })
 
 
-from models.slot import get_slot_timing
+def get_credit_totals():
+    """(total credits, registration count) for the current session, aggregated in SQL."""
+    owner_filter = get_owner_filter()
+    if owner_filter is None:
+        return 0, 0
+    
+    total_credits, course_count = db.session.query(
+        db.func.coalesce(db.func.sum(Course.c), 0),
+        db.func.count(Registration.id)
+    ).select_from(Registration).outerjoin(
+        Slot, Registration.slot_id == Slot.id
+    ).outerjoin(
+        Course, Slot.course_id == Course.id
+    ).filter(owner_filter).one()
+    return int(total_credits), course_count
 
-# ... (omitted)
 
-def check_slot_clashes(new_slot, exclude_reg_id=None, existing_registrations=None):
-    """Check if a new slot clashes with existing registrations."""
-    # Get all individual slots from the new slot
-    new_individual_slots = new_slot.get_individual_slots()
-    
-    # Get all registered slots for current user/guest
-    if existing_registrations is None:
-        query = get_current_registrations_query()
-        registrations = query.all() if query else []
-    else:
-        registrations = existing_registrations
-    
-    clashing_slots = []
-    
-    
-    # Mutual Exclusion Groups
-    GROUP_C1 = {'C11', 'C12', 'C13'}
-    GROUP_A2 = {'A21', 'A22', 'A23'}
-    
-    new_slots_set = set(new_individual_slots)
+def build_occupancy(registrations, exclude_reg_id=None):
+    """
+    One pass over the registrations: map each occupied (day, period) cell to
+    the registrations holding it, and collect (registration, mask) pairs for
+    the mutual exclusion check. Build once, reuse for every candidate slot.
+    """
+    occupied = {}
+    reg_masks = []
     
     for reg in registrations:
         # Exclude specified registration (for updates)
         if exclude_reg_id and reg.id == int(exclude_reg_id):
             continue
+        if not reg.slot:
+            continue
+        
+        reg_masks.append((reg, reg.slot.mask))
+        for cell in slot_code_cells(reg.slot.slot_code):
+            occupied.setdefault(cell, []).append(reg)
+    
+    return occupied, reg_masks
 
-        if reg.slot:
-            registered_individual_slots = reg.slot.get_individual_slots()
-            reg_slots_set = set(registered_individual_slots)
-            
-            # --- Mutual Exclusion Check ---
-            # Check if one set has any C1 slots and the other has any A2 slots
-            has_new_C1 = not new_slots_set.isdisjoint(GROUP_C1)
-            has_new_A2 = not new_slots_set.isdisjoint(GROUP_A2)
-            
-            has_reg_C1 = not reg_slots_set.isdisjoint(GROUP_C1)
-            has_reg_A2 = not reg_slots_set.isdisjoint(GROUP_A2)
-            
-            if (has_new_C1 and has_reg_A2) or (has_new_A2 and has_reg_C1):
-                 clashing_slots.append({
-                    'slot_code': reg.slot.slot_code,
-                    'course_code': reg.slot.course.code if reg.slot.course else '',
-                    'course_name': reg.slot.course.name if reg.slot.course else '',
-                    'reason': 'Mutual exclusion: C1 slots (C11, C12, C13) cannot be taken with A2 slots (A21, A22, A23)'
-                })
-            
-            # Check for overlap
-            for new_s in new_individual_slots:
-                
-                for reg_s in registered_individual_slots:
-                    
-                    # 1. Standard Clash: Same Timing
-                    new_timing = get_slot_timing(new_s)
-                    reg_timing = get_slot_timing(reg_s)
-                    
-                    if new_timing and reg_timing:
-                        if (new_timing['day'] == reg_timing['day'] and 
-                            new_timing['period'] == reg_timing['period']):
-                            clashing_slots.append({
-                                'slot_code': reg.slot.slot_code,
-                                'course_code': reg.slot.course.code if reg.slot.course else '',
-                                'course_name': reg.slot.course.name if reg.slot.course else '',
-                                'reason': 'Time overlap'
-                            })
-                            break
-                    
 
-                
-                if len(clashing_slots) > 0 and clashing_slots[-1] in clashing_slots[:-1]:
-                    # Avoid duplicates
-                     pass
+def _clash_entry(reg, reason):
+    return {
+        'slot_code': reg.slot.slot_code,
+        'course_code': reg.slot.course.code if reg.slot.course else '',
+        'course_name': reg.slot.course.name if reg.slot.course else '',
+        'reason': reason
+    }
+
 
+def check_slot_clashes(new_slot, exclude_reg_id=None, existing_registrations=None, occupancy=None,
+                       first_only=False):
+    """
+    Check if a new slot clashes with existing registrations.
+    With first_only, returns as soon as one clash is found (clashing_slots
+    then holds just that one).
+    """
+    if occupancy is None:
+        # Get all registered slots for current user/guest
+        if existing_registrations is None:
+            query = get_current_registrations_query(for_clash_check=True)
+            registrations = query.all() if query else []
+        else:
+            registrations = existing_registrations
+        occupancy = build_occupancy(registrations, exclude_reg_id)
+    
+    occupied, reg_masks = occupancy
+    clashing_slots = []
+    
+    # --- Mutual Exclusion Check ---
+    # C1 slots on one side and A2 slots on the other
+    new_mask = new_slot.mask
+    for reg, reg_mask in reg_masks:
+        if masks_mutually_exclusive(new_mask, reg_mask):
+            clashing_slots.append(_clash_entry(
+                reg, 'Mutual exclusion: C1 slots (C11, C12, C13) cannot be taken with A2 slots (A21, A22, A23)'
+            ))
+            if first_only:
+                return {'has_clash': True, 'clashing_slots': clashing_slots}
+    
+    # Standard Clash: same (day, period) cell, reported once per registration
+    seen = set()
+    for cell in slot_code_cells(new_slot.slot_code):
+        for reg in occupied.get(cell, ()):
+            if reg.id not in seen:
+                seen.add(reg.id)
+                clashing_slots.append(_clash_entry(reg, 'Time overlap'))
+                if first_only:
+                    return {'has_clash': True, 'clashing_slots': clashing_slots}
     
     return {
         'has_clash': len(clashing_slots) > 0,
@@ -1,11 +1,53 @@
 """Routes for HTML/CSV file upload and parsing."""
 
-from flask import Blueprint, request, jsonify, session, Response
+import io
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from flask import Blueprint, request, jsonify, session, Response, current_app
+from sqlalchemy import insert, tuple_
 from models import db, Course, Faculty, Slot
-from utils.html_parser import parse_vtop_html
-from utils.csv_parser import parse_course_csv
+from models.database import dialect_insert
+from utils.http_cache import add_nocache_headers
+from utils.course_search import course_search_index
+from utils.parse_cache import parse_cache, content_digest, stream_digest
 
 upload_bp = Blueprint('upload', __name__)
+upload_bp.after_request(add_nocache_headers)
+
+HTML_EXTENSIONS = frozenset({'html', 'htm', 'mhtml'})
+IMPORT_EXTENSIONS = HTML_EXTENSIONS | {'csv'}
+PARSE_WORKERS = 8  # max threads parsing one /import batch
+
+
+def _file_extension(filename):
+    """Lowercased extension of filename without the dot ('' if none)."""
+    _, dot, ext = filename.rpartition('.')
+    return ext.lower() if dot else ''
+
+
+def _valid_filename(filename, extensions=HTML_EXTENSIONS):
+    """True if filename has one of the given extensions."""
+    return bool(filename) and _file_extension(filename) in extensions
+
+
+def require_html_upload(view):
+    """Validate the single 'file' upload as HTML/MHTML and pass it to the view."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not _valid_filename(file.filename):
+            return jsonify({'error': 'File must be HTML or MHTML'}), 400
+        
+        return view(file, *args, **kwargs)
+    return wrapper
 
 
 @upload_bp.route('/csv-template', methods=['GET'])
@@ -30,25 +72,22 @@ C11+C12+TC1,ANOTHER FACULTY,AB-105,25
         }
     )
 @upload_bp.route('/parse', methods=['POST'])
-def parse_html_file():
+@require_html_upload
+def parse_html_file(file):
     """
     Parse uploaded HTML file and extract course/slot information.
     Returns parsed data without saving to database.
     """
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-    
-    if not file.filename.lower().endswith(('.html', '.htm', '.mhtml')):
-        return jsonify({'error': 'File must be HTML or MHTML'}), 400
-    
     try:
-        html_content = file.read().decode('utf-8')
-        parsed = parse_vtop_html(html_content)
+        # Imported on demand: the parsers are only needed by upload requests
+        from utils.html_parser import parse_vtop_html_stream
+        
+        # Parse straight from the upload stream (no full bytes + str copies);
+        # re-uploads of the same page are served from the parse cache
+        parsed = parse_cache.get_or_parse(
+            ('html', stream_digest(file.stream)),
+            lambda: parse_vtop_html_stream(file.stream)
+        )
         
         if not parsed['course']:
             return jsonify({'error': 'Could not parse course information from HTML'}), 400
@@ -87,37 +126,67 @@ def import_html_file():
 
     results = []
     success_count = 0
+    pending = []  # (index into results, filename, content)
     
     for file in files:
         if file.filename == '':
             continue
             
-        if not file.filename.lower().endswith(('.html', '.htm', '.mhtml', '.csv')):
+        if not _valid_filename(file.filename, IMPORT_EXTENSIONS):
             results.append({
                 'filename': file.filename,
                 'status': 'error',
                 'message': 'Invalid file type. Supported: HTML, MHTML, CSV'
             })
             continue
+        
+        # FileStorage isn't thread-safe: read the upload here, parse it in the pool
+        pending.append((len(results), file.filename, file.read()))
+        results.append(None)
+    
+    # Parse phase runs concurrently; DB work stays on the request thread/session
+    parsed_uploads = _parse_uploads(pending)
+    
+    # Resolve courses and faculties once for the whole batch, not per file
+    parsed_ok = [parsed for parsed, error in parsed_uploads if error is None and parsed['course']]
+    try:
+        course_ids = _owned_course_ids({p['course']['code'] for p in parsed_ok}, user_id, guest_id)
+        faculty_map = _get_or_create_faculties(
+            {s['faculty'] for p in parsed_ok for s in p['slots'] if s['faculty']}
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error preparing import: {str(e)}'}), 500
+    
+    for (index, filename, _), (parsed, parse_error) in zip(pending, parsed_uploads):
+        if parse_error is not None:
+            results[index] = {'filename': filename, 'status': 'error', 'message': str(parse_error)}
+            continue
 
         try:
             # Process single file
-            result = _process_single_file_import(file, user_id, guest_id)
-            results.append(result)
+            result = _process_single_file_import(
+                filename, parsed, user_id, guest_id, course_ids, faculty_map
+            )
+            results[index] = result
             if result['status'] == 'success':
                 success_count += 1
                 
         except Exception as e:
-            # DB Rollback handled inside helper or here if transaction spans whole loop?
-            # We want partial success, so _process_single_file_import should handle its own transaction lifecycle 
-            # OR we handle it here. 
-            # If we want to isolate errors, we should commit/rollback per file.
-            db.session.rollback() 
-            results.append({
-                'filename': file.filename,
+            # The file's savepoint is already rolled back; the others are kept
+            results[index] = {
+                'filename': filename,
                 'status': 'error',
                 'message': str(e)
-            })
+            }
+    
+    # One commit for the whole batch
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error saving imported files: {str(e)}'}), 500
+    course_search_index.invalidate((user_id, guest_id))
 
     return jsonify({
         'success': True,
@@ -126,36 +195,97 @@ def import_html_file():
         'success_count': success_count
     })
 
-def _process_single_file_import(file, user_id, guest_id):
-    """Helper to process a single file import within the batch."""
-    try:
-        file_content = file.read().decode('utf-8')
-        
-        # Route to appropriate parser based on file extension
-        if file.filename.lower().endswith('.csv'):
-            parsed = parse_course_csv(file_content)
-        else:
-            parsed = parse_vtop_html(file_content)
-        
-        if not parsed['course']:
-            return {'filename': file.filename, 'status': 'error', 'message': 'Could not parse course info'}
-        
-        course_data = parsed['course']
-        print(f"DEBUG: Parsed course: {course_data}")
-        print(f"DEBUG: Parsed slots count: {len(parsed['slots'])}")
-        
-        # Check if course already exists FOR THIS USER
-        query = Course.query.filter_by(code=course_data['code'])
-        if user_id:
-            query = query.filter_by(user_id=user_id)
-        else:
-            query = query.filter_by(guest_id=guest_id)
-            
-        course = query.first()
+def _parse_upload(filename, content):
+    """Parse one uploaded file's bytes. No request/DB access, safe to run in a worker thread."""
+    # Route to appropriate parser based on file extension
+    if _file_extension(filename) == 'csv':
+        from utils.csv_parser import parse_course_csv
+        return parse_cache.get_or_parse(
+            ('csv', content_digest(content)),
+            lambda: parse_course_csv(content.decode('utf-8'))
+        )
+    
+    from utils.html_parser import parse_vtop_html_stream
+    return parse_cache.get_or_parse(
+        ('html', content_digest(content)),
+        lambda: parse_vtop_html_stream(io.BytesIO(content))
+    )
+
+def _parse_uploads(pending):
+    """
+    Parse (index, filename, content) uploads, in parallel when there are
+    several (lxml does its parsing with the GIL released).
+    Returns a (parsed, error) pair per upload, in order.
+    """
+    def parse(item):
+        _, filename, content = item
+        try:
+            return _parse_upload(filename, content), None
+        except Exception as e:
+            return None, e
+    
+    if len(pending) <= 1:
+        return [parse(item) for item in pending]
+    
+    with ThreadPoolExecutor(max_workers=min(PARSE_WORKERS, len(pending))) as executor:
+        return list(executor.map(parse, pending))
+
+def _owned_course_ids(codes, user_id, guest_id):
+    """code -> id of the owner's existing courses among codes (one query)."""
+    if not codes:
+        return {}
+    query = db.session.query(Course.code, Course.id).filter(Course.code.in_(codes))
+    if user_id:
+        query = query.filter(Course.user_id == user_id)
+    else:
+        query = query.filter(Course.guest_id == guest_id)
+    
+    course_ids = {}
+    for code, course_id in query.order_by(Course.id):
+        course_ids.setdefault(code, course_id)
+    return course_ids
+
+def _get_or_create_faculties(faculty_names):
+    """name -> id for every name, inserting the missing ones (two statements at most)."""
+    if not faculty_names:
+        return {}
+    faculty_map = dict(
+        db.session.query(Faculty.name, Faculty.id).filter(Faculty.name.in_(faculty_names)).all()
+    )
+    
+    missing_names = faculty_names - faculty_map.keys()
+    if missing_names:
+        # One multi-row INSERT ... RETURNING instead of ORM add + flush per faculty
+        inserted = db.session.execute(
+            insert(Faculty).returning(Faculty.id, Faculty.name),
+            [{'name': name} for name in missing_names]
+        )
+        faculty_map.update((name, fac_id) for fac_id, name in inserted)
+    return faculty_map
+
+def _process_single_file_import(filename, parsed, user_id, guest_id, course_ids, faculty_map):
+    """
+    Helper to save one parsed file of the batch inside its own SAVEPOINT.
+    Raises on failure (with only this file's rows rolled back); the caller
+    commits the whole batch once.
+    
+    course_ids (owner's code -> id) and faculty_map (name -> id) are resolved
+    once for the whole batch; course_ids is extended with courses created here.
+    """
+    if not parsed['course']:
+        return {'filename': filename, 'status': 'error', 'message': 'Could not parse course info'}
+    
+    course_data = parsed['course']
+    print(f"DEBUG: Parsed course: {course_data}")
+    print(f"DEBUG: Parsed slots count: {len(parsed['slots'])}")
+    
+    with db.session.begin_nested():
+        # Course already exists FOR THIS USER? (looked up for the whole batch)
+        course_id = course_ids.get(course_data['code'])
         
-        # Start Transaction for this file
-        if not course:
-            course = Course(
+        if course_id is None:
+            # INSERT ... RETURNING id, no ORM object or flush needed
+            course_id = db.session.execute(insert(Course).values(
                 code=course_data['code'],
                 name=course_data['name'],
                 l=course_data['l'],
@@ -167,72 +297,61 @@ def _process_single_file_import(file, user_id, guest_id):
                 category=course_data['category'],
                 user_id=user_id,
                 guest_id=guest_id
-            )
-            db.session.add(course)
-            db.session.flush()
-        
-        # --- Batch Process Faculties ---
-        faculty_names = set(s['faculty'] for s in parsed['slots'] if s['faculty'])
-        
-        # Note: In a batch loop, re-querying faculties every time is safe.
-        existing_faculties = Faculty.query.filter(Faculty.name.in_(faculty_names)).all()
-        faculty_map = {f.name: f for f in existing_faculties}
-        
-        missing_names = faculty_names - set(faculty_map.keys())
-        if missing_names:
-            new_facs = []
-            for name in missing_names:
-                f = Faculty(name=name)
-                new_facs.append(f)
-            
-            db.session.add_all(new_facs)
-            db.session.flush()
-            
-            for f in new_facs:
-                faculty_map[f.name] = f
+            ).returning(Course.id)).scalar_one()
 
         # --- Batch Process Slots ---
-        existing_slots = Slot.query.filter_by(course_id=course.id).all()
-        existing_slot_signatures = {(s.slot_code, s.venue) for s in existing_slots}
-        print(f"DEBUG: Existing slot signatures: {existing_slot_signatures}")
-        
-        slots_to_add = []
+        # Slots already stored for this course are skipped by the database
+        # (unique course/slot_code/venue); only dedupe within the file here.
+        # Without that index (migrate_db.py not run yet), look the existing ones up first.
+        seen_signatures = set()
+        if not current_app.config.get('SLOT_UNIQUE_INDEX'):
+            signatures = {(s['slot_code'], s['venue']) for s in parsed['slots']}
+            if signatures:
+                seen_signatures.update(
+                    db.session.query(Slot.slot_code, Slot.venue).filter(
+                        Slot.course_id == course_id,
+                        tuple_(Slot.slot_code, Slot.venue).in_(signatures)
+                    ).all()
+                )
+        slot_rows = []
         for slot_data in parsed['slots']:
             signature = (slot_data['slot_code'], slot_data['venue'])
-            print(f"DEBUG: Checking slot signature: {signature}")
-            
-            if signature not in existing_slot_signatures:
-                faculty = faculty_map.get(slot_data['faculty'])
-                new_slot = Slot(
-                    slot_code=slot_data['slot_code'],
-                    course_id=course.id,
-                    faculty_id=faculty.id if faculty else None,
-                    venue=slot_data['venue'],
-                    available_seats=slot_data['available_seats'],
-                    total_seats=70,
-                    class_nbr=slot_data.get('class_nbr')
+
+            if signature not in seen_signatures:
+                slot_rows.append({
+                    'slot_code': slot_data['slot_code'],
+                    'course_id': course_id,
+                    'faculty_id': faculty_map.get(slot_data['faculty']),
+                    'venue': slot_data['venue'],
+                    'available_seats': slot_data['available_seats'],
+                    'total_seats': 70,
+                    'class_nbr': slot_data.get('class_nbr')
+                })
+                seen_signatures.add(signature)
+
+        slots_added = 0
+        if slot_rows:
+            # Single Core executemany on the table (batched by insertmanyvalues,
+            # no ORM bulk-insert layer); RETURNING counts only the rows that were
+            # actually inserted (rowcount isn't reliable for executemany)
+            slots_table = Slot.__table__
+            if current_app.config.get('SLOT_UNIQUE_INDEX'):
+                stmt = dialect_insert(slots_table).on_conflict_do_nothing(
+                    index_elements=['course_id', 'slot_code', 'venue']
                 )
-                slots_to_add.append(new_slot)
-                existing_slot_signatures.add(signature)
-        
-        if slots_to_add:
-            db.session.add_all(slots_to_add)
-            slots_added = len(slots_to_add)
-        else:
-            slots_added = 0
+            else:
+                stmt = insert(slots_table)
+            stmt = stmt.returning(slots_table.c.id)
+            slots_added = len(db.session.execute(stmt, slot_rows).all())
         
         print(f"DEBUG: Slots to add: {slots_added}")
-        
-        # Commit per file to avoid huge transactions and ensure partial batch success
-        db.session.commit()
-        
-        return {
-            'filename': file.filename,
-            'status': 'success',
-            'course_code': course_data['code'],
-            'slots_added': slots_added
-        }
-        
-    except Exception as e:
-        db.session.rollback()
-        raise e # Re-raise to be caught by the loop handler
+    
+    # Savepoint released: later files in the batch can reuse the course
+    course_ids[course_data['code']] = course_id
+    
+    return {
+        'filename': filename,
+        'status': 'success',
+        'course_code': course_data['code'],
+        'slots_added': slots_added
+    }
@@ -0,0 +1,26 @@
+"""
+Celery tasks for scheduled background jobs.
+
+Run a single worker with an embedded beat scheduler:
+    celery -A tasks worker -B
+"""
+
+from celery import Celery
+from celery.schedules import crontab
+
+from app import app, _perform_cleanup_logic
+
+celery = Celery('tasks', broker=app.config['CELERY_BROKER_URL'])
+
+celery.conf.beat_schedule = {
+    'cleanup': {
+        'task': 'tasks.cleanup_orphaned_data',
+        'schedule': crontab(minute=0),  # Every hour, on the hour
+    },
+}
+
+
+@celery.task(name='tasks.cleanup_orphaned_data')
+def cleanup_orphaned_data():
+    """Delete old GUEST data. Runs once per hour from the beat schedule."""
+    return _perform_cleanup_logic()
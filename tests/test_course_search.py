@@ -0,0 +1,134 @@
+import sys
+import os
+import unittest
+import uuid
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import Course, Faculty
+
+
+class TestCourseSearch(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        # Runs against the persistent dev DB: unique guests, course codes and faculties
+        tag = uuid.uuid4().hex[:6].upper()
+        self.prefix = f'Z{tag}'
+        self.faculties = [f'Test Faculty {tag}', f'Other Faculty {tag}']
+        self.guest_ids = [f'test_guest_{tag}_a', f'test_guest_{tag}_b']
+        self.owner_a = self._client(self.guest_ids[0])
+        self.owner_b = self._client(self.guest_ids[1])
+
+    def tearDown(self):
+        with self.app.app_context():
+            for guest_id in self.guest_ids:
+                for course in Course.query.filter_by(guest_id=guest_id).all():
+                    db.session.delete(course)
+            db.session.flush()
+            Faculty.query.filter(Faculty.name.in_(self.faculties)).delete(synchronize_session=False)
+            db.session.commit()
+
+    def _client(self, guest_id):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['guest_id'] = guest_id
+        return client
+
+    def _add(self, client, suffix, name, slot_code='A11+A12+A13'):
+        response = client.post('/api/courses/manual', json={
+            'course_code': self.prefix + suffix,
+            'course_name': name,
+            'slot_code': slot_code,
+            'faculty': self.faculties[0],
+            'credits': 3
+        })
+        self.assertEqual(response.status_code, 201, response.get_json())
+        return response.get_json()['course']['id']
+
+    def _search(self, client, query):
+        response = client.get('/api/courses/search', query_string={'q': query})
+        self.assertEqual(response.status_code, 200)
+        return sorted(c['code'] for c in response.get_json()['courses'])
+
+    def _all(self, client):
+        response = client.get('/api/courses/all')
+        self.assertEqual(response.status_code, 200)
+        return sorted(c['code'] for c in response.get_json()['courses'])
+
+    def assertCourses(self, client, suffixes):
+        expected = sorted(self.prefix + suffix for suffix in suffixes)
+        self.assertEqual(self._search(client, self.prefix), expected)
+        self.assertEqual(self._all(client), expected)
+
+    def test_search_follows_changes(self):
+        self.assertCourses(self.owner_a, [])
+
+        self._add(self.owner_a, '1', 'Basket Weaving')
+        self.assertCourses(self.owner_a, ['1'])
+        self.assertEqual(self._search(self.owner_a, 'basket weav'), [self.prefix + '1'])
+
+        second_id = self._add(self.owner_a, '2', 'Underwater Pottery')
+        self.assertCourses(self.owner_a, ['1', '2'])
+        self.assertEqual(self._search(self.owner_a, 'pottery'), [self.prefix + '2'])
+
+        # Edit: replace the course's slots
+        response = self.owner_a.post(f'/api/courses/{second_id}/sync', json={'slots': [
+            {'slot_code': 'B11+B12+B13', 'venue': 'AB01-101', 'faculty': self.faculties[1]}
+        ]})
+        self.assertEqual(response.status_code, 200, response.get_json())
+        self.assertCourses(self.owner_a, ['1', '2'])
+        slots = self.owner_a.get(f'/api/courses/{second_id}/slots').get_json()['slots']
+        self.assertEqual([s['slot_code'] for s in slots], ['B11+B12+B13'])
+
+        # Deleting the newest course and adding another leaves (count, max id)
+        # unchanged when the DB reuses the id (SQLite rowids)
+        response = self.owner_a.delete(f'/api/courses/{second_id}')
+        self.assertEqual(response.status_code, 200)
+        self._add(self.owner_a, '3', 'Applied Juggling')
+        self.assertCourses(self.owner_a, ['1', '3'])
+        self.assertEqual(self._search(self.owner_a, 'pottery'), [])
+        self.assertEqual(self._search(self.owner_a, 'juggling'), [self.prefix + '3'])
+
+        response = self.owner_a.delete('/api/courses/bulk', json={
+            'course_ids': [c['id'] for c in self.owner_a.get('/api/courses/all').get_json()['courses']]
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertCourses(self.owner_a, [])
+
+    def test_changes_from_other_workers(self):
+        # Writes that bypass this process's routes (another worker) are only
+        # seen through the DB fingerprint
+        self._add(self.owner_a, '1', 'Basket Weaving')
+        newest_id = self._add(self.owner_a, '2', 'Underwater Pottery')
+        self.assertCourses(self.owner_a, ['1', '2'])
+
+        with self.app.app_context():
+            db.session.delete(db.session.get(Course, int(newest_id)))
+            db.session.commit()
+            # Same count; on SQLite usually the same id as well
+            db.session.add(Course(code=self.prefix + '3', name='Applied Juggling', c=3,
+                                  course_type='N/A', category='N/A', guest_id=self.guest_ids[0]))
+            db.session.commit()
+
+        self.assertCourses(self.owner_a, ['1', '3'])
+        self.assertEqual(self._search(self.owner_a, 'pottery'), [])
+
+    def test_owners_are_isolated(self):
+        self._add(self.owner_a, '1', 'Basket Weaving')
+        self.assertCourses(self.owner_b, [])
+
+        self._add(self.owner_b, '2', 'Basket Weaving Advanced')
+        self.assertCourses(self.owner_a, ['1'])
+        self.assertCourses(self.owner_b, ['2'])
+        self.assertEqual(self._search(self.owner_a, 'basket'), [self.prefix + '1'])
+        self.assertEqual(self._search(self.owner_b, 'basket'), [self.prefix + '2'])
+
+        # Without a session nothing is visible
+        anonymous = self.app.test_client()
+        self.assertEqual(self._search(anonymous, self.prefix), [])
+        self.assertEqual(self._all(anonymous), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import sys
+import os
+import unittest
+import uuid
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import Course, Faculty
+
+
+class TestCourseSlotsEtag(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        # Runs against the persistent dev DB: unique guest, course code and faculties
+        tag = uuid.uuid4().hex[:6].upper()
+        self.guest_id = f'test_guest_{tag}'
+        self.faculties = [f'Test Faculty {tag} A', f'Test Faculty {tag} B']
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['guest_id'] = self.guest_id
+
+        response = self.client.post('/api/courses/manual', json={
+            'course_code': f'Z{tag}1',
+            'course_name': 'Etag Studies',
+            'slot_code': 'A11+A12+A13',
+            'venue': 'V1',
+            'faculty': self.faculties[0]
+        })
+        self.assertEqual(response.status_code, 201, response.get_json())
+        self.course_id = response.get_json()['course']['id']
+
+    def tearDown(self):
+        with self.app.app_context():
+            for course in Course.query.filter_by(guest_id=self.guest_id).all():
+                db.session.delete(course)
+            db.session.flush()
+            Faculty.query.filter(Faculty.name.in_(self.faculties)).delete(synchronize_session=False)
+            db.session.commit()
+
+    def _get_slots(self, etag=None):
+        headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+        return self.client.get(f'/api/courses/{self.course_id}/slots', headers=headers)
+
+    def _sync(self, slots):
+        response = self.client.post(f'/api/courses/{self.course_id}/sync', json={'slots': slots})
+        self.assertEqual(response.status_code, 200, response.get_json())
+
+    def test_unchanged_slots_revalidate(self):
+        first = self._get_slots()
+        self.assertEqual(first.status_code, 200)
+        etag = first.get_etag()[0]
+
+        second = self._get_slots(etag)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.get_etag()[0], etag)
+
+    def test_replaced_slot_changes_etag(self):
+        etag = self._get_slots().get_etag()[0]
+
+        # Replaces the slot; SQLite may hand the new row the old id
+        self._sync([{'slot_code': 'B11+B12+B13', 'venue': 'V2', 'faculty': self.faculties[1]}])
+        response = self._get_slots(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get_etag()[0], etag)
+        self.assertEqual(
+            [(s['slot_code'], s['venue'], s['faculty_name']) for s in response.get_json()['slots']],
+            [('B11+B12+B13', 'V2', self.faculties[1])]
+        )
+
+    def test_seat_change_changes_etag(self):
+        self._sync([{'slot_code': 'A11+A12+A13', 'venue': 'V1', 'faculty': self.faculties[0],
+                     'available_seats': 10}])
+        etag = self._get_slots().get_etag()[0]
+
+        self._sync([{'slot_code': 'A11+A12+A13', 'venue': 'V1', 'faculty': self.faculties[0],
+                     'available_seats': 9}])
+        response = self._get_slots(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['slots'][0]['available_seats'], 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import sys
+import os
+import io
+import json
+import unittest
+from email.charset import Charset, QP, BASE64
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.nonmultipart import MIMENonMultipart
+from email.mime.text import MIMEText
+from email.policy import SMTP
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.html_parser import (
+    parse_vtop_html, parse_vtop_html_stream, _ChunkReader, _decode_lines, SNIFF_BYTES
+)
+
+COURSES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'courses'))
+# Expected parse of every courses/*.html page (recorded with the original BeautifulSoup parser)
+EXPECTED_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'parsed_courses.json')
+
+# Registration page ("Course Detail" table, seats in a <span>)
+REGISTRATION_PAGE = """<!DOCTYPE html>
+<html><body>
+<table>
+  <tr><th>Course Detail</th><th>L T P J C</th><th>Course Type</th><th>Category</th></tr>
+  <tr>
+    <td>MAT2001 - Differential And Difference Equations - Theory Only</td>
+    <td>3 0 0 0 3</td>
+    <td>Theory Only</td>
+    <td>Foundation Core</td>
+  </tr>
+</table>
+<table>
+  <tr><td>Slot</td><td>Venue</td><td>Faculty</td><td>Seats</td></tr>
+  <tr><td>A11+A12+A13</td><td>AB01-101</td><td>PROF ONE</td><td><span>12</span></td></tr>
+  <tr><td>B21+B22</td><td>AB02-202</td><td>PROF TWO</td><td><span>full</span></td></tr>
+  <tr><td>Slots</td><td></td><td></td><td></td></tr>
+</table>
+</body></html>
+"""
+
+
+def _parse_file(path):
+    with open(path, 'rb') as fp:
+        return parse_vtop_html_stream(fp)
+
+
+class TestHtmlParser(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(EXPECTED_PATH, encoding='utf-8') as fp:
+            cls.expected = json.load(fp)
+
+    def test_course_fixtures(self):
+        fixtures = sorted(name for name in os.listdir(COURSES_DIR) if name.endswith('.html'))
+        self.assertEqual(fixtures, sorted(self.expected))
+
+        for name in fixtures:
+            with self.subTest(fixture=name):
+                parsed = _parse_file(os.path.join(COURSES_DIR, name))
+                self.assertEqual(parsed['course'], self.expected[name]['course'])
+                self.assertEqual(parsed['slots'], self.expected[name]['slots'])
+
+    def test_view_slots_page(self):
+        parsed = _parse_file(os.path.join(COURSES_DIR, 'CSA3006.html'))
+
+        self.assertEqual(parsed['course'], {
+            'code': 'CSA3006',
+            'name': 'DATA MINING AND DATA WAREHOUSING',
+            'l': 2, 't': 1, 'p': 1, 'j': 0, 'c': 4,
+            'course_type': 'LTP',
+            'category': ''
+        })
+        self.assertEqual(len(parsed['slots']), 11)
+        self.assertEqual(parsed['slots'][:2], [
+            {'slot_code': 'A11+A12+A13', 'venue': 'AB02-330', 'faculty': 'NILAMADHAB MISHRA',
+             'available_seats': 0, 'class_nbr': None},
+            {'slot_code': 'A11+A12+A13', 'venue': 'LC-002', 'faculty': 'RIZWAN UR RAHMAN',
+             'available_seats': 84, 'class_nbr': None},
+        ])
+
+    def test_registration_page(self):
+        parsed = parse_vtop_html(REGISTRATION_PAGE)
+
+        self.assertEqual(parsed['course'], {
+            'code': 'MAT2001',
+            'name': 'Differential And Difference Equations',
+            'l': 3, 't': 0, 'p': 0, 'j': 0, 'c': 3,
+            'course_type': 'Theory Only',
+            'category': 'Foundation Core'
+        })
+        self.assertEqual(parsed['slots'], [
+            {'slot_code': 'A11+A12+A13', 'venue': 'AB01-101', 'faculty': 'PROF ONE',
+             'available_seats': 12, 'class_nbr': None},
+            {'slot_code': 'B21+B22', 'venue': 'AB02-202', 'faculty': 'PROF TWO',
+             'available_seats': 0, 'class_nbr': None},
+        ])
+
+    def test_page_without_course(self):
+        parsed = parse_vtop_html("<html><body><table><tr><td>nothing</td></tr></table></body></html>")
+        self.assertEqual(parsed, {'course': None, 'slots': []})
+
+        parsed = parse_vtop_html("")
+        self.assertEqual(parsed, {'course': None, 'slots': []})
+
+
+def _html_part(page, transfer_encoding, charset='utf-8'):
+    body_charset = Charset(charset)
+    body_charset.body_encoding = transfer_encoding
+    return MIMEText(page, 'html', body_charset)
+
+
+def _qp_soft_wrapped_part(page, width):
+    """text/html part whose quoted-printable body has a soft line break every `width` bytes."""
+    tokens = [chr(b) if 33 <= b <= 126 and b != ord('=') else '=%02X' % b for b in page.encode('utf-8')]
+    part = MIMENonMultipart('text', 'html', charset='utf-8')
+    part['Content-Transfer-Encoding'] = 'quoted-printable'
+    part.set_payload('=\n'.join(''.join(tokens[i:i + width]) for i in range(0, len(tokens), width)))
+    return part
+
+
+def _mhtml(*parts):
+    """Saved-page style archive (multipart/related, CRLF line endings)."""
+    archive = MIMEMultipart('related')
+    for part in parts:
+        archive.attach(part)
+    return archive.as_bytes(policy=SMTP)
+
+
+class TestMhtmlDecoding(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(COURSES_DIR, 'CSA3006.html'), encoding='utf-8') as fp:
+            # Non-ASCII text so charset and split multi-byte characters matter
+            cls.page = fp.read().replace('NILAMADHAB MISHRA', 'JOSÉ ÑÚÑEZ')
+        cls.plain = parse_vtop_html_stream(io.BytesIO(cls.page.encode('utf-8')))
+
+    def assertSameParse(self, archive):
+        parsed = parse_vtop_html_stream(io.BytesIO(archive))
+        self.assertEqual(parsed, self.plain)
+
+    def test_plain_page(self):
+        self.assertEqual(self.plain['course']['code'], 'CSA3006')
+        self.assertEqual(self.plain['slots'][0]['faculty'], 'JOSÉ ÑÚÑEZ')
+
+    def test_quoted_printable(self):
+        self.assertSameParse(_mhtml(_html_part(self.page, QP)))
+
+    def test_base64(self):
+        self.assertSameParse(_mhtml(_html_part(self.page, BASE64)))
+
+    def test_charset(self):
+        for transfer_encoding in (QP, BASE64):
+            with self.subTest(transfer_encoding=transfer_encoding):
+                self.assertSameParse(_mhtml(_html_part(self.page, transfer_encoding, 'iso-8859-1')))
+
+    def test_soft_line_breaks(self):
+        # Every line is one decoded chunk, so these widths split tags, header
+        # words and multi-byte UTF-8 characters across chunk boundaries
+        for width in (1, 2, 3, 7):
+            with self.subTest(width=width):
+                self.assertSameParse(_mhtml(_qp_soft_wrapped_part(self.page, width)))
+
+    def test_html_part_not_first(self):
+        # A large image ahead of the page pushes it past the sniffed head
+        image = MIMEImage(b'\x89PNG' + bytes(range(256)) * (SNIFF_BYTES // 256), 'png')
+        stylesheet = MIMEText('td { color: red; }', 'css')
+        trailer = MIMEText('<html><body>frame</body></html>', 'html')
+        self.assertSameParse(_mhtml(image, stylesheet, _html_part(self.page, QP), trailer))
+
+    def test_single_part_archive(self):
+        self.assertSameParse(_html_part(self.page, QP).as_bytes(policy=SMTP))
+
+    def test_no_html_part(self):
+        parsed = parse_vtop_html_stream(io.BytesIO(_mhtml(MIMEText('td { color: red; }', 'css'))))
+        self.assertEqual(parsed, {'course': None, 'slots': []})
+
+    def test_decode_lines(self):
+        qp_lines = [b'<td>JOS=C3=\r\n', b'=89</td>\r\n', b'--boundary\r\n', b'after\r\n']
+        self.assertEqual(
+            b''.join(_decode_lines(iter(qp_lines), 'quoted-printable', b'--boundary')),
+            '<td>JOSÉ</td>\r\n'.encode('utf-8')
+        )
+
+        # base64 lines that don't end on a 4-character group
+        b64_lines = [b'PGh0\r\n', b'bW\r\n', b'w+\r\n']
+        self.assertEqual(b''.join(_decode_lines(iter(b64_lines), 'base64')), b'<html>')
+
+    def test_chunk_reader(self):
+        reader = io.BufferedReader(_ChunkReader([b'ab', b'', b'cde', b'f']), buffer_size=3)
+        self.assertEqual(reader.read(4), b'abcd')
+        self.assertEqual(reader.read(), b'ef')
+        self.assertEqual(reader.read(), b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import sys
+import os
+import unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models import Course, Registration, Slot
+from models.slot import slot_code_cells
+from routes.registration import build_occupancy, check_slot_clashes
+
+
+def make_registration(reg_id, code, slot_code):
+    """Transient Registration of a one-slot course; nothing touches the DB."""
+    course = Course(id=reg_id, code=code, name=code, c=3, course_type='LTP', category='')
+    slot = Slot(id=reg_id, slot_code=slot_code, course=course, course_id=reg_id)
+    return Registration(id=reg_id, slot=slot, slot_id=reg_id)
+
+
+class TestSlotClashes(unittest.TestCase):
+    def setUp(self):
+        # Overlapping registrations already stored (e.g. saved before a clash check)
+        self.registrations = [
+            make_registration(1, 'MAT1001', 'A11+A12+A13'),
+            make_registration(2, 'PHY1001', 'A11+B11'),
+            make_registration(3, 'CHY1001', 'D11+D12'),
+        ]
+
+    def clashing_codes(self, slot_code, **kwargs):
+        result = check_slot_clashes(Slot(slot_code=slot_code), existing_registrations=self.registrations,
+                                    **kwargs)
+        return [entry['course_code'] for entry in result['clashing_slots']]
+
+    def test_every_registration_in_a_cell_is_reported(self):
+        occupied, _ = build_occupancy(self.registrations)
+        self.assertEqual([reg.id for reg in occupied[slot_code_cells('A11')[0]]], [1, 2])
+
+        # A11 is held by two registrations, B11 by the second again: each reported once
+        self.assertEqual(self.clashing_codes('A11+B11'), ['MAT1001', 'PHY1001'])
+        self.assertEqual(self.clashing_codes('A11+A12+A13+D11+D12'), ['MAT1001', 'PHY1001', 'CHY1001'])
+        self.assertEqual(self.clashing_codes('E11'), [])
+
+    def test_first_only(self):
+        self.assertEqual(self.clashing_codes('A11+B11', first_only=True), ['MAT1001'])
+
+    def test_excluded_registration(self):
+        self.assertEqual(self.clashing_codes('A11', exclude_reg_id=1), ['PHY1001'])
+
+
+if __name__ == '__main__':
+    unittest.main()
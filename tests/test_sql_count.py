@@ -0,0 +1,87 @@
+import sys
+import os
+import unittest
+import uuid
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import Course, Faculty, Registration
+
+# Non-clashing slots, one course each
+SLOT_CODES = ['A11+A12+A13', 'B11+B12+B13', 'D11+D12', 'E11+E12', 'F11+F12']
+
+
+class TestSqlCount(unittest.TestCase):
+    """Statements per request (X-SQL-Count) must not grow with the data (no N+1)."""
+
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        # The counter only runs in debug mode
+        self.debug = self.app.debug
+        self.app.debug = True
+        # Runs against the persistent dev DB: unique guest, course codes and faculties
+        tag = uuid.uuid4().hex[:6].upper()
+        self.prefix = f'Z{tag}'
+        self.faculties = [f'Test Faculty {tag} {i}' for i in range(len(SLOT_CODES))]
+        self.guest_id = f'test_guest_{tag}'
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['guest_id'] = self.guest_id
+
+    def tearDown(self):
+        self.app.debug = self.debug
+        with self.app.app_context():
+            Registration.query.filter_by(guest_id=self.guest_id).delete(synchronize_session=False)
+            for course in Course.query.filter_by(guest_id=self.guest_id).all():
+                db.session.delete(course)
+            db.session.flush()
+            Faculty.query.filter(Faculty.name.in_(self.faculties)).delete(synchronize_session=False)
+            db.session.commit()
+
+    def _sql_count(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return int(response.headers['X-SQL-Count'])
+
+    def _add_course(self, index):
+        """Manual add also registers the course's slot."""
+        response = self.client.post('/api/courses/manual', json={
+            'course_code': f'{self.prefix}{index}',
+            'course_name': f'Course {index}',
+            'slot_code': SLOT_CODES[index],
+            'faculty': self.faculties[index],
+            'credits': 3
+        })
+        self.assertEqual(response.status_code, 201, response.get_json())
+        return response.get_json()['course']['id']
+
+    def test_registrations(self):
+        self._add_course(0)
+        one = self._sql_count('/api/registration/')
+        # Registrations, then one IN query each for slots, courses and
+        # faculties, then the credit totals
+        self.assertLessEqual(one, 5)
+
+        for index in range(1, len(SLOT_CODES)):
+            self._add_course(index)
+        response = self.client.get('/api/registration/')
+        self.assertEqual(response.get_json()['count'], len(SLOT_CODES))
+        self.assertEqual(int(response.headers['X-SQL-Count']), one)
+
+    def test_course_slots(self):
+        course_id = self._add_course(0)
+        one = self._sql_count(f'/api/courses/{course_id}/slots')
+        self.assertLessEqual(one, 3)
+
+        # More slots, each with its own faculty
+        response = self.client.post(f'/api/courses/{course_id}/sync', json={'slots': [
+            {'slot_code': slot_code, 'venue': f'V{index}', 'faculty': self.faculties[index]}
+            for index, slot_code in enumerate(SLOT_CODES)
+        ]})
+        self.assertEqual(response.status_code, 200, response.get_json())
+        self.assertEqual(self._sql_count(f'/api/courses/{course_id}/slots'), one)
+
+
+if __name__ == '__main__':
+    unittest.main()
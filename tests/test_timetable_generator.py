@@ -0,0 +1,175 @@
+import sys
+import os
+import random
+import unittest
+from itertools import combinations, product
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models import Course, Slot, Faculty
+from models.slot import SLOT_TIMINGS, slot_code_cells, split_slot_code
+from utils.timetable_generator import TimetableGenerator, GenerationPreferences
+
+A1 = 'A11+A12+A13'
+B1 = 'B11+B12+B13'
+C1 = 'C11+C12+C13'
+A2 = 'A21+A22+A23'
+B2 = 'B21+B22+B23'
+D1 = 'D11+D12'
+
+
+def make_course(course_id, code, slots):
+    """Transient Course with (slot_id, slot_code, faculty_name) slots; nothing touches the DB."""
+    course = Course(id=course_id, code=code, name=code, l=3, t=0, p=0, j=0, c=3,
+                    course_type='LTP', category='')
+    for slot_id, slot_code, faculty_name in slots:
+        Slot(id=slot_id, slot_code=slot_code, course=course, course_id=course_id,
+             faculty=Faculty(name=faculty_name), venue=f'AB01-{slot_id}')
+    return course
+
+
+def slots_clash(slot_a, slot_b):
+    """Reference clash check: a shared (day, period) cell, or C1 taken with A2."""
+    if set(slot_code_cells(slot_a.slot_code)) & set(slot_code_cells(slot_b.slot_code)):
+        return True
+    c1, a2 = {'C11', 'C12', 'C13'}, {'A21', 'A22', 'A23'}
+    codes_a, codes_b = set(split_slot_code(slot_a.slot_code)), set(split_slot_code(slot_b.slot_code))
+    return bool((codes_a & c1 and codes_b & a2) or (codes_a & a2 and codes_b & c1))
+
+
+def brute_force_timetables(courses):
+    return [
+        combo for combo in product(*(course.slots for course in courses))
+        if not any(slots_clash(a, b) for a, b in combinations(combo, 2))
+    ]
+
+
+class TestTimetableGenerator(unittest.TestCase):
+    def setUp(self):
+        # _build_slot_map shuffles before sorting by score
+        random.seed(1234)
+        self.maths = make_course(1, 'MAT1001', [(11, A1, 'F1'), (12, B1, 'F2'), (13, C1, 'F3')])
+        self.physics = make_course(2, 'PHY1001', [
+            (21, A1, 'F4'), (22, A2, 'F5'), (23, B2, 'F6'), (24, B2, 'F7')
+        ])
+        self.chemistry = make_course(3, 'CHY1001', [(31, B1, 'F8'), (32, D1, 'F9'), (33, C1, 'F10')])
+
+    def test_count_solutions(self):
+        generator = TimetableGenerator([self.maths, self.physics])
+        # 3 x 4 pairs minus A1/A1 (same cells) and C1/A2 (mutually exclusive)
+        self.assertEqual(generator.count_solutions(), 10)
+
+        courses = [self.maths, self.physics, self.chemistry]
+        generator = TimetableGenerator(courses)
+        self.assertEqual(generator.count_solutions(), len(brute_force_timetables(courses)))
+        self.assertEqual(generator.count_solutions(max_count=3), 3)
+
+    def test_count_distinct_solutions(self):
+        generator = TimetableGenerator([self.maths, self.physics])
+        # The two B2 teachers collapse into one time pattern
+        self.assertEqual(generator.count_distinct_solutions(), 7)
+
+        courses = [self.maths, self.physics, self.chemistry]
+        generator = TimetableGenerator(courses)
+        patterns = {
+            tuple(slot.slot_code for slot in combo)
+            for combo in brute_force_timetables(courses)
+        }
+        self.assertEqual(generator.count_distinct_solutions(), len(patterns))
+        self.assertEqual(generator.count_distinct_solutions(max_count=2), 2)
+
+    def test_c1_a2_mutual_exclusion(self):
+        # C1 and A2 share no time cell, but can't be taken together
+        courses = [
+            make_course(4, 'CSE1001', [(41, C1, 'F1')]),
+            make_course(5, 'CSE1002', [(51, A2, 'F2'), (52, A2, 'F3')]),
+        ]
+        self.assertFalse(set(slot_code_cells(C1)) & set(slot_code_cells(A2)))
+
+        generator = TimetableGenerator(courses)
+        self.assertEqual(generator.count_solutions(), 0)
+        self.assertEqual(generator.count_distinct_solutions(), 0)
+        self.assertEqual(generator.generate_exhaustive(), [])
+
+    def test_exhaustive_is_clash_free(self):
+        courses = [self.maths, self.physics, self.chemistry]
+        generator = TimetableGenerator(courses)
+        solutions = generator.generate_exhaustive(target_size=1000)
+
+        self.assertEqual(len(solutions), generator.count_solutions())
+        self.assertEqual(
+            {frozenset(slot.id for slot in solution.slots) for solution in solutions},
+            {frozenset(slot.id for slot in combo) for combo in brute_force_timetables(courses)}
+        )
+        for solution in solutions:
+            self.assertEqual(sorted(slot.course_id for slot in solution.slots), [1, 2, 3])
+            for a, b in combinations(solution.slots, 2):
+                self.assertFalse(slots_clash(a, b), f'{a.slot_code} clashes with {b.slot_code}')
+
+        scores = [solution.score for solution in solutions]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(len(generator.generate_exhaustive(target_size=5)), 5)
+
+
+class TestBeamSearch(unittest.TestCase):
+    def setUp(self):
+        random.seed(1234)
+        # 4 courses x 4 single-cell slots, no code shared and no C1/A2 codes:
+        # nothing clashes, so the best k timetables extend the best k partial ones
+        # and a beam of width k must find exactly the exhaustive top k.
+        # Spreading each course over periods (and credits) keeps score ties rare.
+        codes_by_period = {period: [] for period in range(1, 8)}
+        for code in sorted(SLOT_TIMINGS):
+            if code[:2] not in ('C1', 'A2'):
+                codes_by_period[SLOT_TIMINGS[code]['period']].append(code)
+        self.courses = []
+        for i in range(4):
+            course_id = i + 1
+            course = make_course(course_id, f'CSE100{course_id}', [
+                (course_id * 10 + j, codes_by_period[(i + 2 * j) % 7 + 1].pop(), f'F{course_id}{j}')
+                for j in range(4)
+            ])
+            course.c = i + 2
+            self.courses.append(course)
+        self.preferences = GenerationPreferences(time_mode='morning')
+
+    def generator(self, courses=None, preferences=None):
+        # Beam search prunes slot_map (arc consistency), so each run gets its own generator
+        return TimetableGenerator(courses or self.courses, preferences or self.preferences)
+
+    def exhaustive_top_scores(self, k):
+        # Exhaustive scores are per-slot averages, beam scores per-slot sums
+        n = len(self.courses)
+        return [round(s.score * n, 6) for s in self.generator().generate_exhaustive(target_size=k)]
+
+    def test_beam_matches_exhaustive_top_k(self):
+        for k in (1, 3, 5, 10):
+            with self.subTest(k=k):
+                solutions = self.generator().generate_beam_search(
+                    beam_width=k, target_size=k, branching_factor=100
+                )
+                self.assertEqual([round(s.score, 6) for s in solutions], self.exhaustive_top_scores(k))
+
+    def test_iterative_beam_matches_exhaustive_top_k(self):
+        solutions = self.generator().generate_iterative_beam_search(
+            time_budget_s=60.0, target_size=5, max_beam_width=8
+        )
+        self.assertEqual([round(s.score, 6) for s in solutions], self.exhaustive_top_scores(5))
+
+    def test_wide_beam_finds_every_timetable(self):
+        # A beam wider than any level keeps every clash-free partial timetable
+        maths = make_course(1, 'MAT1001', [(11, A1, 'F1'), (12, B1, 'F2'), (13, C1, 'F3')])
+        physics = make_course(2, 'PHY1001', [(21, A1, 'F4'), (22, A2, 'F5'), (23, B2, 'F6'), (24, B2, 'F7')])
+        chemistry = make_course(3, 'CHY1001', [(31, B1, 'F8'), (32, D1, 'F9'), (33, C1, 'F10')])
+        courses = [maths, physics, chemistry]
+
+        solutions = self.generator(courses).generate_beam_search(
+            beam_width=100, target_size=100, branching_factor=100
+        )
+        self.assertEqual(
+            {frozenset(slot.id for slot in solution.slots) for solution in solutions},
+            {frozenset(slot.id for slot in combo) for combo in brute_force_timetables(courses)}
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,17 @@
 """Utils package."""
 
-from utils.html_parser import parse_vtop_html, parse_multiple_html_files
+# Parsers are resolved lazily (PEP 562) so that importing any utils module
+# doesn't pull in lxml on cold start.
+_LAZY_ATTRS = {
+    'parse_vtop_html': 'utils.html_parser',
+    'parse_multiple_html_files': 'utils.html_parser',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,78 @@
+"""In-process per-owner course snapshots for the search and listing endpoints."""
+
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import orjson
+
+
+class CourseSnapshot:
+    """An owner's courses as (code_lower, name_lower, payload) rows, sorted by code."""
+
+    def __init__(self, courses):
+        self.rows = sorted(
+            ((c.code.lower(), c.name.lower(), c.to_dict()) for c in courses),
+            key=lambda row: row[2]['code']
+        )
+
+    @cached_property
+    def all_json(self):
+        """Pre-serialized /courses/all response body."""
+        return orjson.dumps({'courses': [row[2] for row in self.rows]})
+
+    def search(self, query_text, limit=20):
+        """Code prefix matches first, then substring matches on code or name."""
+        q = query_text.lower()
+        results = [row[2] for row in self.rows if row[0].startswith(q)][:limit]
+
+        if len(results) < limit:
+            for code, name, payload in self.rows:
+                if not code.startswith(q) and (q in code or q in name):
+                    results.append(payload)
+                    if len(results) == limit:
+                        break
+
+        return results
+
+
+class CourseSearchIndex:
+    """
+    Caches a CourseSnapshot per owner in memory (LRU).
+
+    Entries are checked against a (count, max id, max created_at) fingerprint
+    read from the DB, so courses created or deleted by other workers/instances
+    are picked up too - created_at also covers a deleted newest course being
+    replaced by one that reuses its id (SQLite rowids). Courses aren't edited
+    in place; routes that write an owner's courses additionally invalidate()
+    the entry so this worker doesn't wait for the next fingerprint read.
+    """
+
+    def __init__(self, max_owners=256):
+        self.max_owners = max_owners
+        self._entries = OrderedDict()  # owner_key -> (fingerprint, snapshot)
+        self._lock = threading.Lock()
+
+    def snapshot(self, owner_key, fingerprint, load_courses):
+        """Return the cached snapshot, rebuilding it via load_courses() if stale."""
+        with self._lock:
+            entry = self._entries.get(owner_key)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(owner_key)
+                return entry[1]
+
+        snapshot = CourseSnapshot(load_courses())
+        with self._lock:
+            self._entries[owner_key] = (fingerprint, snapshot)
+            self._entries.move_to_end(owner_key)
+            while len(self._entries) > self.max_owners:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, owner_key):
+        """Drop an owner's cached snapshot (after their courses changed)."""
+        with self._lock:
+            self._entries.pop(owner_key, None)
+
+
+course_search_index = CourseSearchIndex()
@@ -1,7 +1,66 @@
 """HTML Parser for VIT FFCS course pages."""
 
-from bs4 import BeautifulSoup
+import binascii
+import io
 import re
+from email.parser import BytesHeaderParser
+
+from lxml import etree
+
+try:
+    import re2 as _fast_re  # linear-time DFA engine (pip install google-re2), if available
+except ImportError:
+    _fast_re = re
+
+# Run once per table cell: compiled on re2 when installed
+_RE_COURSE_CODE = _fast_re.compile(r'^[A-Z]{3}\d{4}$')
+
+# Raw-page prefix checked for MIME markers and the page format
+SNIFF_BYTES = 64 * 1024
+
+# Table header patterns (matched against individual text nodes)
+_RE_COURSE_DETAIL = re.compile(r'Course Detail', re.IGNORECASE)
+_RE_COURSE_CODE_HDR = re.compile(r'Course Code', re.IGNORECASE)
+_RE_COURSE_TITLE = re.compile(r'Course Title', re.IGNORECASE)
+_RE_SLOT_HEADER = re.compile(r'^Slot$', re.IGNORECASE)
+_RE_VENUE = re.compile(r'^Venue$', re.IGNORECASE)
+_RE_FACULTY = re.compile(r'^Faculty$', re.IGNORECASE)
+
+
+def _text(elem):
+    """Element text with each text node stripped (BeautifulSoup's get_text(strip=True))."""
+    return ''.join(s.strip() for s in elem.itertext())
+
+
+def _only_string(elem):
+    """
+    Text of an element whose entire content is a single string, directly or
+    through a chain of single children (BeautifulSoup's Tag.string), else None.
+    """
+    while len(elem):
+        if len(elem) > 1 or (elem.text or '').strip() or (elem[0].tail or '').strip():
+            return None
+        elem = elem[0]
+    return elem.text
+
+
+def _int_or_zero(text):
+    """int(text) for a digit string, else 0."""
+    return int(text) if text.isdigit() else 0
+
+
+def _has_text(table, pattern):
+    """True if any text node inside table matches pattern."""
+    return any(pattern.search(s) for s in table.itertext())
+
+
+def _find_th(table, pattern):
+    """First <th> in table whose only string matches pattern, else None."""
+    for th in table.iter('th'):
+        string = _only_string(th)
+        if string is not None and pattern.search(string):
+            return th
+    return None
 
 
 def parse_vtop_html(html_content):
@@ -15,226 +74,354 @@ def parse_vtop_html(html_content):
     Returns:
         dict containing course info and list of slots
     """
-    # Pre-process: Handle MHTML / Quoted-Printable
-    if 'Content-Transfer-Encoding: quoted-printable' in html_content or 'MIME-Version:' in html_content:
-        import quopri
-        
-        # Decode quoted-printable
-        try:
-            # Convert to bytes, decode, then back to string
-            decoded_bytes = quopri.decodestring(html_content.encode('utf-8'))
-            html_content = decoded_bytes.decode('utf-8', errors='ignore')
-        except Exception as e:
-            print(f"MHTML Decode Warning: {e}")
+    return parse_vtop_html_stream(io.BytesIO(html_content.encode('utf-8')))
 
-    # Strip headers looking for doctype or html tag
-    match = re.search(r'(<!DOCTYPE html>|<html)', html_content, re.IGNORECASE)
-    if match:
-        html_content = html_content[match.start():]
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    result = {
-        'course': None,
-        'slots': []
-    }
+def parse_vtop_html_stream(fp):
+    """
+    Streaming variant of parse_vtop_html for uploaded files.
     
-    # Try Format 1: Registration page (DIFFERENTIAL.html style)
-    # Look for "Course Detail" header
-    result = try_parse_registration_format(soup)
+    The page is parsed incrementally straight from the file object, so it is
+    never held in memory as one string or one tree. MHTML archives are
+    decoded on the fly as well (see _iter_mhtml_html).
     
-    if result['course']:
-        return result
+    Args:
+        fp: Binary file-like object (e.g. werkzeug FileStorage.stream)
+        
+    Returns:
+        dict containing course info and list of slots
+    """
+    head = fp.read(SNIFF_BYTES)
+    fp.seek(0)
     
-    # Try Format 2: View Slots page (CN.html / OS.html style)
-    result = try_parse_view_slots_format(soup)
+    # Pre-process: Handle MHTML / Quoted-Printable
+    # (no format sniffing here: encoded text may split the header words)
+    if b'Content-Transfer-Encoding: quoted-printable' in head or b'MIME-Version:' in head:
+        if head.lstrip().startswith(b'<'):
+            # Bare quoted-printable document, no MIME headers
+            chunks, charset = _decode_lines(fp, 'quoted-printable'), None
+        else:
+            chunks, charset = _iter_mhtml_html(fp)
+        fp = io.BufferedReader(_ChunkReader(chunks))
+        return _parse_tables(_extract_tables(fp, charset or 'utf-8'))
     
-    return result
+    return _parse_tables(_extract_tables(fp), view_slots_first=_looks_like_view_slots(head))
 
 
-def try_parse_registration_format(soup):
-    """Parse the registration page format (Course Detail header)."""
-    result = {'course': None, 'slots': []}
+def _looks_like_view_slots(head):
+    """Sniff a View Slots page from the start of the raw HTML."""
+    return b'Course Title' in head and b'Course Detail' not in head
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only binary file object over an iterator of byte chunks."""
     
-    tables = soup.find_all('table')
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
     
-    for table in tables:
-        # Look for "Course Detail" header
-        header = table.find(string=re.compile(r'Course Detail', re.IGNORECASE))
-        if header:
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 4:
-                    course_detail = cells[0].get_text(strip=True)
-                    ltpjc = cells[1].get_text(strip=True)
-                    course_type = cells[2].get_text(strip=True)
-                    category = cells[3].get_text(strip=True)
-                    
-                    # Parse: "MAT2001 - Differential And Difference Equations - ..."
-                    parts = course_detail.split(' - ')
-                    if len(parts) >= 2:
-                        course_code = parts[0].strip()
-                        course_name = parts[1].strip()
-                        
-                        ltpjc_parts = ltpjc.split()
-                        if len(ltpjc_parts) >= 5:
-                            result['course'] = {
-                                'code': course_code,
-                                'name': course_name,
-                                'l': int(ltpjc_parts[0]) if ltpjc_parts[0].isdigit() else 0,
-                                't': int(ltpjc_parts[1]) if ltpjc_parts[1].isdigit() else 0,
-                                'p': int(ltpjc_parts[2]) if ltpjc_parts[2].isdigit() else 0,
-                                'j': int(ltpjc_parts[3]) if ltpjc_parts[3].isdigit() else 0,
-                                'c': int(ltpjc_parts[4]) if ltpjc_parts[4].isdigit() else 0,
-                                'course_type': course_type,
-                                'category': category
-                            }
-                    break
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b''
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _read_headers(lines):
+    """Consume a MIME header block (up to the blank line) from a line iterator."""
+    block = []
+    for line in lines:
+        if not line.strip():
+            break
+        block.append(line)
+    return BytesHeaderParser().parsebytes(b''.join(block))
+
+
+def _decode_lines(lines, transfer_encoding, delimiter=None):
+    """Yield the decoded body lines of a MIME part, up to the next boundary delimiter."""
+    transfer_encoding = (transfer_encoding or '').strip().lower()
+    pending = b''  # base64 carried over to the next line (4-byte groups only)
+    
+    for line in lines:
+        if delimiter is not None and line.startswith(delimiter):
             break
+        if transfer_encoding == 'quoted-printable':
+            yield binascii.a2b_qp(line)
+        elif transfer_encoding == 'base64':
+            pending += line.strip()
+            cut = len(pending) - len(pending) % 4
+            yield binascii.a2b_base64(pending[:cut])
+            pending = pending[cut:]
+        else:
+            yield line
+
+
+def _iter_mhtml_html(fp):
+    """
+    Locate the text/html part of a saved MHTML page.
     
-    if not result['course']:
-        return result
+    Returns (chunks, charset): an iterator over the part's decoded body and
+    its declared charset. The file is read line by line and reading stops at
+    the end of the HTML part, so the base64 images and stylesheets bundled
+    in the archive are never decoded or parsed.
+    """
+    lines = iter(fp)
+    headers = _read_headers(lines)
+    boundary = headers.get_param('boundary')
+    if not boundary:
+        # Single-part archive: the body is the document
+        encoding = headers.get('Content-Transfer-Encoding', 'quoted-printable')
+        return _decode_lines(lines, encoding), headers.get_content_charset()
     
-    # Find slot table (Slot, Venue, Faculty headers)
-    for table in tables:
-        slot_header = table.find(string=re.compile(r'^Slot$', re.IGNORECASE))
-        if slot_header:
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 3:
-                    slot_code = cells[0].get_text(strip=True)
-                    venue = cells[1].get_text(strip=True)
-                    faculty = cells[2].get_text(strip=True)
-                    
-                    if slot_code.lower() in ['slot', 'slots', ''] or 'Slots' in slot_code:
-                        continue
-                    
-                    available_seats = 0
-                    for cell in cells:
-                        span = cell.find('span')
-                        if span:
-                            seats_text = span.get_text(strip=True)
-                            if seats_text.isdigit():
-                                available_seats = int(seats_text)
-                    
-                    if slot_code and venue:
-                        result['slots'].append({
-                            'slot_code': slot_code,
-                            'venue': venue,
-                            'faculty': faculty,
-                            'available_seats': available_seats,
-                            'class_nbr': None
-                        })
+    delimiter = b'--' + boundary.encode('ascii', errors='ignore')
+    for line in lines:
+        if not line.startswith(delimiter):
+            continue
+        headers = _read_headers(lines)
+        if headers.get_content_type() == 'text/html':
+            chunks = _decode_lines(lines, headers.get('Content-Transfer-Encoding'), delimiter)
+            return chunks, headers.get_content_charset()
+    
+    return iter(()), None
+
+
+def _extract_tables(fp, encoding='utf-8'):
+    """
+    Every <table> element of an HTML document, nested ones included, in
+    document order.
+    
+    Reads the (binary) file object with lxml's iterparse and keeps only the
+    table subtrees (detached from the document); everything else is cleared
+    as soon as it has ended, so the rest of the DOM is never built up.
+    """
+    tables = []
+    table_depth = 0
+    try:
+        for event, elem in etree.iterparse(fp, events=('start', 'end'), html=True, encoding=encoding):
+            if event == 'start':
+                if elem.tag == 'table':
+                    table_depth += 1
+                continue
+            
+            if elem.tag == 'table':
+                table_depth -= 1
+                if table_depth == 0:
+                    # Outermost table finished: keep the element (nested tables included)
+                    tables.append(elem)
+                    parent = elem.getparent()
+                    if parent is not None:
+                        parent.remove(elem)
+            elif table_depth == 0:
+                # Outside any table: nothing here is needed once it has ended
+                elem.clear()
+                parent = elem.getparent()
+                if parent is not None:
+                    while elem.getprevious() is not None:
+                        del parent[0]
+    except etree.XMLSyntaxError:
+        # Empty document - nothing to parse
+        pass
+    
+    return [table for outer in tables for table in outer.iter('table')]
+
+
+def _parse_tables(tables, view_slots_first=False):
+    """
+    Run the known page-format parsers over a document's <table> elements.
+    The format sniffed from the raw page goes first; the other one is only
+    tried if it finds no course.
+    """
+    # Format 1: Registration page (DIFFERENTIAL.html style), "Course Detail" header
+    # Format 2: View Slots page (CN.html / OS.html style)
+    parsers = [try_parse_registration_format, try_parse_view_slots_format]
+    if view_slots_first:
+        parsers.reverse()
+    
+    for parser in parsers:
+        result = parser(tables)
+        if result['course']:
+            return result
     
     return result
 
 
-def try_parse_view_slots_format(soup):
-    """Parse the View Slots page format (Course Code, Course Title headers)."""
+def try_parse_registration_format(tables):
+    """Parse the registration page format (Course Detail header)."""
     result = {'course': None, 'slots': []}
+    course_table_seen = False
     
-    tables = soup.find_all('table')
-    
-    # Find course info table (has Course Code and Course Title headers)
+    # One pass: the first "Course Detail" table holds the course, every
+    # table with a "Slot" header contributes slots
     for table in tables:
-        code_header = table.find('th', string=re.compile(r'Course Code', re.IGNORECASE))
-        title_header = table.find('th', string=re.compile(r'Course Title', re.IGNORECASE))
+        if not course_table_seen and _has_text(table, _RE_COURSE_DETAIL):
+            course_table_seen = True
+            result['course'] = _parse_registration_course(table)
         
-        if code_header and title_header:
-            # Found course info table
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 8:  # Need Course Owner, Code, Title, L, T, P, J, C
-                    # Find the cells with course code and title
-                    # Structure: Course Owner, Course Code, Course Title, L, T, P, J, C, Pre-Requisite, Co-Requisite, Anti-Requisite
-                    course_code = None
-                    course_name = None
-                    l_val = t_val = p_val = j_val = c_val = 0
-                    
-                    for i, cell in enumerate(cells):
-                        text = cell.get_text(strip=True)
-                        # Course codes are like CSE3006, MAT2001
-                        if re.match(r'^[A-Z]{3}\d{4}$', text):
-                            course_code = text
-                            if i + 1 < len(cells):
-                                course_name = cells[i + 1].get_text(strip=True)
-                            # L, T, P, J, C should be next
-                            if i + 2 < len(cells):
-                                l_text = cells[i + 2].get_text(strip=True)
-                                l_val = int(l_text) if l_text.isdigit() else 0
-                            if i + 3 < len(cells):
-                                t_text = cells[i + 3].get_text(strip=True)
-                                t_val = int(t_text) if t_text.isdigit() else 0
-                            if i + 4 < len(cells):
-                                p_text = cells[i + 4].get_text(strip=True)
-                                p_val = int(p_text) if p_text.isdigit() else 0
-                            if i + 5 < len(cells):
-                                j_text = cells[i + 5].get_text(strip=True)
-                                j_val = int(j_text) if j_text.isdigit() else 0
-                            if i + 6 < len(cells):
-                                c_text = cells[i + 6].get_text(strip=True)
-                                c_val = int(c_text) if c_text.isdigit() else 0
-                            break
-                    
-                    if course_code and course_name:
-                        result['course'] = {
-                            'code': course_code,
-                            'name': course_name,
-                            'l': l_val,
-                            't': t_val,
-                            'p': p_val,
-                            'j': j_val,
-                            'c': c_val,
-                            'course_type': 'LTP',
-                            'category': ''
-                        }
-                        break
-            break
+        if _has_text(table, _RE_SLOT_HEADER):
+            result['slots'].extend(_parse_registration_slots(table))
     
     if not result['course']:
-        return result
+        result['slots'] = []
+    return result
+
+
+def _parse_registration_course(table):
+    """Course info from the first full row of the Course Detail table (or None)."""
+    for row in table.iter('tr'):
+        cells = list(row.iter('td'))
+        if len(cells) >= 4:
+            course_detail = _text(cells[0])
+            ltpjc = _text(cells[1])
+            course_type = _text(cells[2])
+            category = _text(cells[3])
+            
+            # Parse: "MAT2001 - Differential And Difference Equations - ..."
+            parts = course_detail.split(' - ')
+            if len(parts) >= 2:
+                course_code = parts[0].strip()
+                course_name = parts[1].strip()
+                
+                ltpjc_parts = ltpjc.split()
+                if len(ltpjc_parts) >= 5:
+                    return {
+                        'code': course_code,
+                        'name': course_name,
+                        'l': _int_or_zero(ltpjc_parts[0]),
+                        't': _int_or_zero(ltpjc_parts[1]),
+                        'p': _int_or_zero(ltpjc_parts[2]),
+                        'j': _int_or_zero(ltpjc_parts[3]),
+                        'c': _int_or_zero(ltpjc_parts[4]),
+                        'course_type': course_type,
+                        'category': category
+                    }
+            return None
+    return None
+
+
+def _parse_registration_slots(table):
+    """Slot rows (Slot, Venue, Faculty, ... seats in a <span>) of a registration-page table."""
+    slots = []
+    for row in table.iter('tr'):
+        cells = list(row.iter('td'))
+        if len(cells) >= 3:
+            slot_code = _text(cells[0])
+            venue = _text(cells[1])
+            faculty = _text(cells[2])
+            
+            if slot_code.lower() in ['slot', 'slots', ''] or 'Slots' in slot_code:
+                continue
+            
+            available_seats = 0
+            for cell in cells:
+                span = next(cell.iter('span'), None)
+                if span is not None:
+                    seats_text = _text(span)
+                    if seats_text.isdigit():
+                        available_seats = int(seats_text)
+            
+            if slot_code and venue:
+                slots.append({
+                    'slot_code': slot_code,
+                    'venue': venue,
+                    'faculty': faculty,
+                    'available_seats': available_seats,
+                    'class_nbr': None
+                })
+    return slots
+
+
+def try_parse_view_slots_format(tables):
+    """Parse the View Slots page format (Course Code, Course Title headers)."""
+    result = {'course': None, 'slots': []}
+    course_table_seen = False
     
-    # Find slots table (has Slot, Venue, Faculty headers)
+    # One pass: the first table with Course Code + Course Title headers holds
+    # the course, every table with Slot + Venue + Faculty headers has slots
     for table in tables:
-        slot_header = table.find('th', string=re.compile(r'^Slot$', re.IGNORECASE))
-        venue_header = table.find('th', string=re.compile(r'^Venue$', re.IGNORECASE))
-        faculty_header = table.find('th', string=re.compile(r'^Faculty$', re.IGNORECASE))
+        if (not course_table_seen
+                and _find_th(table, _RE_COURSE_CODE_HDR) is not None
+                and _find_th(table, _RE_COURSE_TITLE) is not None):
+            course_table_seen = True
+            result['course'] = _parse_view_slots_course(table)
         
-        if slot_header and venue_header and faculty_header:
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 4:
-                    # Structure: Course Type, Slot, Venue, Faculty, Slot Status, Total Seats, Alloted Seats, Available Seats
-                    slot_code = cells[1].get_text(strip=True)
-                    venue = cells[2].get_text(strip=True)
-                    faculty = cells[3].get_text(strip=True)
-                    
-                    # Skip header-like rows
-                    if not slot_code or slot_code.lower() in ['slot', 'slots']:
-                        continue
-                    
-                    # Get available seats (last cell)
-                    available_seats = 0
-                    if len(cells) >= 8:
-                        seats_text = cells[7].get_text(strip=True)
-                        if seats_text.isdigit():
-                            available_seats = int(seats_text)
-                    
-                    result['slots'].append({
-                        'slot_code': slot_code,
-                        'venue': venue,
-                        'faculty': faculty,
-                        'available_seats': available_seats,
-                        'class_nbr': None
-                    })
+        if (_find_th(table, _RE_SLOT_HEADER) is not None
+                and _find_th(table, _RE_VENUE) is not None
+                and _find_th(table, _RE_FACULTY) is not None):
+            result['slots'].extend(_parse_view_slots_slots(table))
     
+    if not result['course']:
+        result['slots'] = []
     return result
 
 
+def _parse_view_slots_course(table):
+    """Course info from the course table of a View Slots page (or None)."""
+    for row in table.iter('tr'):
+        cells = list(row.iter('td'))
+        if len(cells) >= 8:  # Need Course Owner, Code, Title, L, T, P, J, C
+            # Structure: Course Owner, Course Code, Course Title, L, T, P, J, C, Pre-Requisite, Co-Requisite, Anti-Requisite
+            # Course codes are like CSE3006, MAT2001
+            course_code = _text(cells[1])
+            if not _RE_COURSE_CODE.match(course_code):
+                continue
+            course_name = _text(cells[2])
+            l_val, t_val, p_val, j_val, c_val = (_int_or_zero(_text(cell)) for cell in cells[3:8])
+            
+            if course_code and course_name:
+                return {
+                    'code': course_code,
+                    'name': course_name,
+                    'l': l_val,
+                    't': t_val,
+                    'p': p_val,
+                    'j': j_val,
+                    'c': c_val,
+                    'course_type': 'LTP',
+                    'category': ''
+                }
+    return None
+
+
+def _parse_view_slots_slots(table):
+    """Slot rows of a View Slots page slots table."""
+    slots = []
+    for row in table.iter('tr'):
+        cells = list(row.iter('td'))
+        if len(cells) >= 4:
+            # Structure: Course Type, Slot, Venue, Faculty, Slot Status, Total Seats, Alloted Seats, Available Seats
+            slot_code = _text(cells[1])
+            venue = _text(cells[2])
+            faculty = _text(cells[3])
+            
+            # Skip header-like rows
+            if not slot_code or slot_code.lower() in ['slot', 'slots']:
+                continue
+            
+            # Get available seats (last cell)
+            available_seats = 0
+            if len(cells) >= 8:
+                seats_text = _text(cells[7])
+                if seats_text.isdigit():
+                    available_seats = int(seats_text)
+            
+            slots.append({
+                'slot_code': slot_code,
+                'venue': venue,
+                'faculty': faculty,
+                'available_seats': available_seats,
+                'class_nbr': None
+            })
+    return slots
+
+
 def parse_multiple_html_files(html_contents):
     """
     Parse multiple HTML files and combine results.
@@ -0,0 +1,24 @@
+"""HTTP cache-control helpers."""
+
+import hashlib
+
+
+def add_nocache_headers(response):
+    """
+    Mark a response as uncacheable (per-user HTML / API data).
+    Register with `blueprint.after_request`; views that set their own
+    Cache-Control (e.g. ETag-validated endpoints) are left untouched.
+    """
+    if 'Cache-Control' in response.headers:
+        return response
+
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    response.headers['Pragma'] = 'no-cache'
+    response.headers['Expires'] = '0'
+    return response
+
+
+def make_etag(*parts):
+    """Build a short ETag from the given fingerprint values."""
+    raw = ':'.join(str(p) for p in parts)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
@@ -0,0 +1,52 @@
+"""In-process LRU of parsed uploads, keyed by a hash of the file contents."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_digest(data):
+    """Fingerprint of an upload's bytes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def stream_digest(fp, chunk_size=1 << 16):
+    """Fingerprint of a binary file object's contents, read in chunks; rewinds fp."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: fp.read(chunk_size), b''):
+        digest.update(chunk)
+    fp.seek(0)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Parsed {course, slots} results by (format, content digest).
+
+    Students often upload the same saved VTOP page more than once; a hit
+    skips parsing entirely. Cached results are shared, treat them as
+    read-only.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_parse(self, key, parse):
+        """Return the cached result for key, or parse() and cache it."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        result = parse()
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+
+parse_cache = ParseCache()
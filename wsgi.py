@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers.
+
+    gunicorn wsgi:app    (settings in gunicorn.conf.py)
+"""
+
+from app import app
+
+__all__ = ['app']